@@ -1 +1,2 @@
-pyinstaller --onefile --noconsole --add-data="gui.ui;." --add-data="excel-icon.png;." --add-data="word-icon.png;." --add-data="loading.gif;." main.py
\ No newline at end of file
+call pyuic4 gui.ui -o gui_ui.py
+pyinstaller --onefile --noconsole --add-data="gui.ui;." --add-data="excel-icon.png;." --add-data="word-icon.png;." --add-data="loading.gif;." main.py
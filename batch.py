@@ -0,0 +1,418 @@
+"""
+Batch generation split into units of work that any number of worker processes can share
+
+A work directory holds a manifest of every constituency x template unit. Workers, on one machine or on several
+machines sharing the directory, claim units by creating a lock file for them, which only one worker can do, render
+the unit with write_doc and then mark it done. A claim that's older than the timeout is treated as abandoned, e.g.
+the worker was killed, and can be taken over by another worker.
+
+    python batch.py create <dir> --book data.xlsx --template summary.docx --template detailed.docx
+    python batch.py work <dir> --processes 4
+    python batch.py status <dir>
+"""
+import argparse
+import json
+import multiprocessing
+import ntpath
+import os
+import random
+import socket
+import sys
+import time
+import traceback
+import uuid
+
+from doc_template import DocTemplate
+from doc_writer import template_dirs, write_doc
+from excel import ExcelBook
+
+MANIFEST_NAME = "manifest.json"
+DEFAULT_CLAIM_TIMEOUT = 600
+MAX_POLL_INTERVAL = 5  # most seconds a worker waits before looking for units to claim again
+
+
+class WorkManifest:
+    """
+    The manifest and the claim/done/failed markers of a work directory
+
+    Every state change is a single atomic filesystem operation: a claim is an exclusive create of claims/<unit>.lock,
+    taking over a stale claim is a rename of that lock, and completion is a rename into done/ or failed/. A lock holds
+    the id of the worker that made it, and a worker only releases its own
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._claims = os.path.join(directory, "claims")
+        self._done = os.path.join(directory, "done")
+        self._failed = os.path.join(directory, "failed")
+
+        with open(os.path.join(directory, MANIFEST_NAME), encoding="utf-8") as f:
+            manifest = json.load(f)
+
+        self.book_path = manifest["book"]
+        self.template_paths = manifest["templates"]
+        self.output_dir = manifest["output"]
+        self.units = manifest["units"]
+
+        self._finished = None  # ids of units known to be done or failed, read from disk on the first claim
+        self._next = None  # index of the unit this worker looks at first on its next claim
+
+    @classmethod
+    def create(cls, directory, book_path, template_paths, constituencies, output_dir=None):
+        """
+        Write a new manifest with a unit for every constituency and template
+
+        Args:
+            directory: work directory, created if needed
+            book_path: excel workbook
+            template_paths: list of word templates
+            constituencies: list of constituency names
+            output_dir: where the documents go, defaults to 'output' in the work directory
+
+        Returns:
+            WorkManifest for the directory
+        """
+        for sub in ("claims", "done", "failed"):
+            os.makedirs(os.path.join(directory, sub), exist_ok=True)
+
+        units = []
+        for constituency in constituencies:
+            for template in range(len(template_paths)):
+                units.append({"id": "{:06d}".format(len(units)), "constituency": constituency, "template": template})
+
+        manifest = {
+            "book": os.path.abspath(book_path),
+            "templates": [os.path.abspath(p) for p in template_paths],
+            "output": os.path.abspath(output_dir or os.path.join(directory, "output")),
+            "units": units,
+        }
+
+        path = os.path.join(directory, MANIFEST_NAME)
+        _write_atomic(path, json.dumps(manifest, indent=1))
+
+        return cls(directory)
+
+    def claim(self, worker_id, claim_timeout=DEFAULT_CLAIM_TIMEOUT):
+        """
+        Claim the next unit that isn't finished or claimed by someone else
+
+        Each worker starts at a random unit and carries on from its last claim, so workers don't all race for the same
+        locks. Finished units are listed once and then remembered, a unit someone else finishes later is found when
+        it's claimed and checked, or when a pass over the units finds nothing to claim
+
+        Returns:
+            The unit, or None if every unit is finished or claimed by someone else, see unfinished
+        """
+        if self._finished is None:
+            self._finished = set(os.listdir(self._done)) | set(os.listdir(self._failed))
+            self._next = random.randrange(len(self.units)) if self.units else 0
+
+        for step in range(len(self.units)):
+            idx = (self._next + step) % len(self.units)
+            unit = self.units[idx]
+            if unit["id"] in self._finished:
+                continue
+
+            if self._try_claim(unit, worker_id, claim_timeout):
+                # it may have been finished by someone else before the claim
+                if self.is_finished(unit):
+                    self._finished.add(unit["id"])
+                    self.release(unit, worker_id)
+                    continue
+
+                self._next = idx + 1
+                return unit
+
+        self._finished |= set(os.listdir(self._done)) | set(os.listdir(self._failed))
+        return None
+
+    def unfinished(self):
+        """
+        Returns:
+            Number of units not done or failed as of the last claim, including ones claimed by other workers
+        """
+        return len(self.units) - len(self._finished or ())
+
+    def _try_claim(self, unit, worker_id, claim_timeout):
+        lock = self._lock_path(unit)
+        try:
+            fd = os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            if not self._reclaim_stale(lock, claim_timeout):
+                return False
+
+            try:
+                fd = os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                return False
+
+        with os.fdopen(fd, "w") as f:
+            f.write("{}\n{}\n".format(worker_id, time.time()))
+
+        return True
+
+    @staticmethod
+    def _reclaim_stale(lock, claim_timeout):
+        """
+        Move a claim out of the way if nobody has touched it within the timeout. Only one worker can win the rename
+
+        The rename isn't tied to the check before it, so another worker may have taken the stale lock over and made a
+        fresh one in between. The renamed file is checked again and put back if it isn't the lock that was stale
+
+        Returns:
+            True if the lock was removed
+        """
+        try:
+            if time.time() - os.stat(lock).st_mtime < claim_timeout:
+                return False
+
+            owner = _read_owner(lock)
+            stale = "{}.stale-{}".format(lock, uuid.uuid4().hex)
+            os.rename(lock, stale)
+        except FileNotFoundError:
+            # released or taken over by someone else in the meantime
+            return False
+
+        if time.time() - os.stat(stale).st_mtime < claim_timeout or _read_owner(stale) != owner:
+            try:
+                # link rather than rename, so a lock made since isn't overwritten
+                os.link(stale, lock)
+            except FileExistsError:
+                pass
+
+            os.remove(stale)
+            return False
+
+        os.remove(stale)
+        return True
+
+    def heartbeat(self, unit):
+        """
+        Refresh a claim so it isn't taken over as stale
+        """
+        try:
+            os.utime(self._lock_path(unit))
+        except FileNotFoundError:
+            pass
+
+    def release(self, unit, worker_id):
+        """
+        Remove the claim on a unit, unless it has been taken over by another worker
+        """
+        lock = self._lock_path(unit)
+        try:
+            if _read_owner(lock) == worker_id:
+                os.remove(lock)
+        except FileNotFoundError:
+            pass
+
+    def complete(self, unit, worker_id):
+        _write_atomic(os.path.join(self._done, unit["id"]), worker_id + "\n")
+        self._mark_finished(unit)
+        self.release(unit, worker_id)
+
+    def fail(self, unit, worker_id, details):
+        _write_atomic(os.path.join(self._failed, unit["id"]), "{}\n{}".format(worker_id, details))
+        self._mark_finished(unit)
+        self.release(unit, worker_id)
+
+    def _mark_finished(self, unit):
+        if self._finished is not None:
+            self._finished.add(unit["id"])
+
+    def is_finished(self, unit):
+        return (os.path.exists(os.path.join(self._done, unit["id"])) or
+                os.path.exists(os.path.join(self._failed, unit["id"])))
+
+    def status(self):
+        """
+        Returns:
+            Dict with the number of units that are done, failed, claimed and waiting
+        """
+        done = set(os.listdir(self._done))
+        failed = set(os.listdir(self._failed))
+        claimed = {name[:-len(".lock")] for name in os.listdir(self._claims) if name.endswith(".lock")}
+
+        counts = {"done": 0, "failed": 0, "claimed": 0, "waiting": 0}
+        for unit in self.units:
+            if unit["id"] in done:
+                counts["done"] += 1
+            elif unit["id"] in failed:
+                counts["failed"] += 1
+            elif unit["id"] in claimed:
+                counts["claimed"] += 1
+            else:
+                counts["waiting"] += 1
+
+        return counts
+
+    def _lock_path(self, unit):
+        return os.path.join(self._claims, unit["id"] + ".lock")
+
+
+def _read_owner(lock):
+    """
+    Returns:
+        Id of the worker that made a lock, empty if it hasn't been written yet
+    """
+    with open(lock, encoding="utf-8") as f:
+        return f.readline().rstrip("\n")
+
+
+def _write_atomic(path, text):
+    tmp = "{}.tmp-{}".format(path, uuid.uuid4().hex)
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+
+    os.replace(tmp, path)
+
+
+def worker_name():
+    return "{}-{}".format(socket.gethostname(), os.getpid())
+
+
+def run_worker(directory, claim_timeout=DEFAULT_CLAIM_TIMEOUT):
+    """
+    Claim and render units until every unit is finished
+
+    While the only units left are claimed by other workers, the worker waits and tries again, so a claim left by a
+    worker that died is taken over once it goes stale
+
+    The book and each template are only loaded once there is a unit that needs them. If the book can't be loaded the
+    unit is released and the error raised, leaving every unit for a later run. A template that can't be loaded fails
+    only that template's units
+
+    Returns:
+        Number of units this worker rendered
+    """
+    manifest = WorkManifest(directory)
+    worker_id = worker_name()
+    book = None
+    templates = {}  # template index to the loaded DocTemplate
+    load_errors = {}  # template index to the traceback of its failed load
+    dirs = template_dirs([ntpath.basename(p) for p in manifest.template_paths], manifest.output_dir)
+    done = 0
+
+    while True:
+        unit = manifest.claim(worker_id, claim_timeout)
+        if unit is None:
+            if not manifest.unfinished():
+                return done
+
+            time.sleep(min(claim_timeout / 4, MAX_POLL_INTERVAL))
+            continue
+
+        if book is None:
+            try:
+                book = _load_book(manifest.book_path)
+            except Exception:
+                manifest.release(unit, worker_id)
+                raise
+
+            manifest.heartbeat(unit)
+
+        idx = unit["template"]
+        if idx not in templates and idx not in load_errors:
+            try:
+                templates[idx] = _load_template(manifest.template_paths[idx])
+            except Exception:
+                load_errors[idx] = traceback.format_exc()
+
+            manifest.heartbeat(unit)
+
+        if idx in load_errors:
+            manifest.fail(unit, worker_id, load_errors[idx])
+            continue
+
+        try:
+            write_doc(unit["constituency"], book, templates[idx], dirs[idx])
+        except Exception:
+            manifest.fail(unit, worker_id, traceback.format_exc())
+        else:
+            manifest.complete(unit, worker_id)
+            done += 1
+
+
+def _load_book(path):
+    book = ExcelBook()
+    if not book.load(path):
+        raise ValueError("No year sheets found in {}".format(path))
+
+    return book
+
+
+def _load_template(path):
+    template = DocTemplate()
+    template.load(path)
+
+    return template
+
+
+def _create(args):
+    book = ExcelBook()
+    if not book.load(args.book):
+        print("No year sheets found in {}".format(args.book))
+        return 1
+
+    constituencies = args.constituency or [str(c) for c in book.get_constituencies()[book.years[0]]]
+    manifest = WorkManifest.create(args.directory, args.book, args.template, constituencies, args.output)
+    print("{} units written to {}".format(len(manifest.units), args.directory))
+
+    return 0
+
+
+def _work(args):
+    if args.processes <= 1:
+        print("{} units done".format(run_worker(args.directory, args.claim_timeout)))
+    else:
+        # plain processes rather than a Pool, pool workers can't start the excel sheet workers of their own
+        processes = [multiprocessing.Process(target=run_worker, args=(args.directory, args.claim_timeout))
+                     for _ in range(args.processes)]
+        for p in processes:
+            p.start()
+
+        for p in processes:
+            p.join()
+
+    print(WorkManifest(args.directory).status())
+
+    return 0
+
+
+def _status(args):
+    print(WorkManifest(args.directory).status())
+
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate documents in shards from a shared work directory")
+    commands = parser.add_subparsers(dest="command")
+    commands.required = True
+
+    create = commands.add_parser("create", help="write the work manifest")
+    create.add_argument("directory")
+    create.add_argument("--book", required=True)
+    create.add_argument("--template", action="append", required=True)
+    create.add_argument("--constituency", action="append", help="defaults to every constituency in the book")
+    create.add_argument("--output", help="defaults to 'output' in the work directory")
+    create.set_defaults(run=_create)
+
+    work = commands.add_parser("work", help="claim and render units until none are left")
+    work.add_argument("directory")
+    work.add_argument("--processes", type=int, default=1)
+    work.add_argument("--claim-timeout", type=float, default=DEFAULT_CLAIM_TIMEOUT,
+                      help="seconds before another worker's claim is treated as abandoned")
+    work.set_defaults(run=_work)
+
+    status = commands.add_parser("status", help="count finished and remaining units")
+    status.add_argument("directory")
+    status.set_defaults(run=_status)
+
+    args = parser.parse_args(argv)
+    return args.run(args)
+
+
+if __name__ == '__main__':
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,193 @@
+import io
+import re
+import zipfile
+
+from xml.sax.saxutils import escape
+
+# Private use characters, they can't come from a real template
+_BOUNDARY = "\ue000{}\ue001"
+_BOUNDARY_RE = re.compile("\ue000([0-9]+)\ue001".encode("utf-8"))
+_HOLE = "\ue002"
+_HOLE_BYTES = _HOLE.encode("utf-8")
+_MARKER_BYTES = [c.encode("utf-8") for c in "\ue000\ue001\ue002"]
+
+_XML_SPACE = "{http://www.w3.org/XML/1998/namespace}space"
+_W_T = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}t"
+
+
+class _Slot:
+    """
+    A fillable piece of document.xml: a table cell or the title paragraph
+
+    Holds the bytes the slot has when it isn't written to, and the bytes either side of the text when it is
+    """
+
+    def __init__(self, keys):
+        self.keys = keys  # (year, standard column name) that write to this slot, None for the title
+        self.original = b""
+        self.prefix = b""
+        self.suffix = b""
+
+    def render(self, title, values):
+        if self.keys is None:
+            text = title
+        else:
+            # set_value writes the keys in order, so where several share a merged cell the last one wins
+            text = next((values[key] for key in reversed(self.keys) if key in values), None)
+
+        if text is None:
+            return self.original
+
+        return self.prefix + escape(text).encode("utf-8") + self.suffix
+
+
+class CompiledTemplate:
+    """
+    Renders documents for a template by joining pre-encoded bytes instead of editing a python-docx tree
+
+    word/document.xml is split into static byte segments and slots. Each slot is a table cell that DocTemplate could
+    write to, or the title paragraph, compiled from a shadow copy of the template that was filled with markers through
+    the normal set_value/set_title calls. Rendering is then just escaping the values and joining bytes, and every
+    other part of the .docx is copied as is
+    """
+
+    def __init__(self, docx_bytes, shadow):
+        """
+        Args:
+            docx_bytes: the saved template, styles included
+            shadow: DocTemplate opened from docx_bytes, it is filled with markers and can't be used afterwards
+
+        Raises:
+            ValueError: the template can't be compiled
+        """
+        self._document_name, xml = shadow.document_xml()
+        if any(marker in xml for marker in _MARKER_BYTES):
+            raise ValueError("Template already contains compiler markers")
+
+        self._slots = []
+        cells = {}
+        for year, standard_name, table, cell in shadow.iter_slots():
+            tc = cell._tc
+            if tc not in cells:
+                cells[tc] = (len(self._slots), table)
+                self._slots.append(_Slot([]))
+                _wrap(tc, len(self._slots) - 1)
+
+            self._slots[cells[tc][0]].keys.append((year, standard_name))
+
+        _, xml = shadow.document_xml()
+        for idx, content in self._split(xml)[1]:
+            self._slots[idx].original = content
+
+        for tc, (idx, table) in cells.items():
+            year, standard_name = self._slots[idx].keys[0]
+            table.set_value(year, standard_name, _HOLE)
+            _preserve_space(tc)
+
+        title = shadow.set_title(_HOLE)
+        if title is not None:
+            self._slots.append(_Slot(None))
+            _wrap(title._p, len(self._slots) - 1)
+
+        _, xml = shadow.document_xml()
+        static, slots = self._split(xml)
+        for idx, content in slots:
+            prefix, hole, suffix = content.partition(_HOLE_BYTES)
+            if not hole:
+                raise ValueError("Slot {} lost its marker".format(idx))
+
+            self._slots[idx].prefix = prefix
+            self._slots[idx].suffix = suffix
+
+        self._pieces = [static[0]]
+        for (idx, _), segment in zip(slots, static[1:]):
+            self._pieces.append(self._slots[idx])
+            self._pieces.append(segment)
+
+        # writestr fills in offsets and sizes on the ZipInfo it's given, so only plain values are kept and every
+        # render builds its own, otherwise renders running at the same time corrupt each other's archives
+        with zipfile.ZipFile(io.BytesIO(docx_bytes)) as source:
+            self._parts = [(info.filename, info.date_time, info.compress_type, source.read(info))
+                           for info in source.infolist()]
+
+    @staticmethod
+    def _split(xml):
+        """
+        Split serialised xml on the slot boundaries
+
+        Returns:
+            Tuple of the list of static segments and a list of (slot index, slot bytes), static segments go around the
+            slots so there is always one more static segment than slots
+        """
+        tokens = _BOUNDARY_RE.split(xml)
+        segments = tokens[0::2]
+        ids = tokens[1::2]
+
+        if len(ids) % 2 or ids[0::2] != ids[1::2]:
+            raise ValueError("Slot boundaries are unbalanced")
+
+        static = segments[0::2]
+        slots = [(int(idx), content) for idx, content in zip(ids[0::2], segments[1::2])]
+
+        return static, slots
+
+    def render_document_xml(self, title, values):
+        """
+        Args:
+            title: text of the title paragraph, None for no title
+            values: dict of (year, standard column name) mapped to the cell text
+
+        Returns:
+            Bytes of word/document.xml
+        """
+        return b"".join([piece if piece.__class__ is bytes else piece.render(title, values)
+                         for piece in self._pieces])
+
+    def render(self, title, values):
+        """
+        Args:
+            title: text of the title paragraph, None for no title
+            values: dict of (year, standard column name) mapped to the cell text
+
+        Returns:
+            Bytes of the .docx
+        """
+        document = self.render_document_xml(title, values)
+
+        out = io.BytesIO()
+        with zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED) as z:
+            for filename, date_time, compress_type, data in self._parts:
+                info = zipfile.ZipInfo(filename, date_time)
+                info.compress_type = compress_type
+                z.writestr(info, document if filename == self._document_name else data)
+
+        return out.getvalue()
+
+    def save(self, path, title, values):
+        with open(path, "wb") as f:
+            f.write(self.render(title, values))
+
+
+def _wrap(element, idx):
+    """
+    Put boundary markers either side of an element using the surrounding text nodes
+    """
+    marker = _BOUNDARY.format(idx)
+
+    previous = element.getprevious()
+    if previous is not None:
+        previous.tail = (previous.tail or "") + marker
+    else:
+        parent = element.getparent()
+        parent.text = (parent.text or "") + marker
+
+    element.tail = marker + (element.tail or "")
+
+
+def _preserve_space(tc):
+    """
+    Values may have leading or trailing spaces, which python-docx keeps by setting xml:space on the run text
+    """
+    for t in tc.iter(_W_T):
+        if t.text == _HOLE:
+            t.set(_XML_SPACE, "preserve")
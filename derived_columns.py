@@ -0,0 +1,265 @@
+"""
+Columns computed from the excel data rather than read from it
+
+A derived column is declared with a header, an expression over the workbook's columns and an excel number format.
+After a book loads, every expression is evaluated with NumPy across all constituencies of a year at once, and the
+results are added to each year's sheet, so templates pick them up by header like any other column.
+
+Expressions are built from Column and the helpers below, and can be combined with + - * / and numbers:
+
+    DerivedColumn("Change in Clients", yoy("Number of Clients"), "0")
+    DerivedColumn("Share of Clients", share("Number of Clients"), "0.0%")
+    DerivedColumn("3 Year Average Clients", mean("Number of Clients", 3), "0.0")
+    DerivedColumn("Clients per Visit", Column("Number of Clients") / Column("Number of Visits"), "0.00")
+
+A derived column is skipped if the workbook already has a column with the same name, or if a column it uses is
+missing. Cells with no value, e.g. a year-over-year change in the first year, are written as '-'.
+"""
+import column_name_formatter as cf
+import numpy as np
+
+
+class Expr:
+    def evaluate(self, context, year):
+        """
+        Args:
+            context: _Context of the book being evaluated
+            year: year the result is for
+
+        Returns:
+            Float array with a value per constituency of that year, NaN where there is no value
+        """
+        raise NotImplementedError
+
+    def columns(self):
+        """
+        Returns:
+            Set of the column headers the expression reads
+        """
+        raise NotImplementedError
+
+    def __add__(self, other):
+        return _BinOp(np.add, self, other)
+
+    def __radd__(self, other):
+        return _BinOp(np.add, other, self)
+
+    def __sub__(self, other):
+        return _BinOp(np.subtract, self, other)
+
+    def __rsub__(self, other):
+        return _BinOp(np.subtract, other, self)
+
+    def __mul__(self, other):
+        return _BinOp(np.multiply, self, other)
+
+    def __rmul__(self, other):
+        return _BinOp(np.multiply, other, self)
+
+    def __truediv__(self, other):
+        return _BinOp(np.divide, self, other)
+
+    def __rtruediv__(self, other):
+        return _BinOp(np.divide, other, self)
+
+
+class Column(Expr):
+    """
+    A workbook column, optionally from an earlier year
+    """
+
+    def __init__(self, header, years_back=0):
+        self.header = header
+        self.years_back = years_back
+
+    def evaluate(self, context, year):
+        return context.column(self.header, str(int(year) - self.years_back), year)
+
+    def columns(self):
+        return {self.header}
+
+
+class _Constant(Expr):
+    def __init__(self, value):
+        self.value = value
+
+    def evaluate(self, context, year):
+        return np.full(context.size(year), self.value, dtype=float)
+
+    def columns(self):
+        return set()
+
+
+class _BinOp(Expr):
+    def __init__(self, op, left, right):
+        self.op = op
+        self.left = left if isinstance(left, Expr) else _Constant(left)
+        self.right = right if isinstance(right, Expr) else _Constant(right)
+
+    def evaluate(self, context, year):
+        return self.op(self.left.evaluate(context, year), self.right.evaluate(context, year))
+
+    def columns(self):
+        return self.left.columns() | self.right.columns()
+
+
+class Shifted(Expr):
+    """
+    An expression evaluated for an earlier year, lined up with this year's constituencies
+    """
+
+    def __init__(self, expr, years_back):
+        self.expr = expr
+        self.years_back = years_back
+
+    def evaluate(self, context, year):
+        earlier = str(int(year) - self.years_back)
+        if earlier not in context.book.sheets:
+            return np.full(context.size(year), np.nan)
+
+        return context.align(self.expr.evaluate(context, earlier), earlier, year)
+
+    def columns(self):
+        return self.expr.columns()
+
+
+class Share(Expr):
+    """
+    An expression as a fraction of its value on the 'All Constituents' row
+    """
+
+    def __init__(self, expr):
+        self.expr = expr
+
+    def evaluate(self, context, year):
+        values = self.expr.evaluate(context, year)
+        total_row = context.book.sheets[year].total_row()
+        if total_row is None:
+            return np.full(values.shape, np.nan)
+
+        return values / values[total_row]
+
+    def columns(self):
+        return self.expr.columns()
+
+
+class Mean(Expr):
+    """
+    Average of an expression over this year and the years before it. No value unless every year has one
+    """
+
+    def __init__(self, expr, years):
+        self.expr = expr
+        self.years = years
+
+    def evaluate(self, context, year):
+        stacked = np.vstack([Shifted(self.expr, back).evaluate(context, year) for back in range(self.years)])
+        return stacked.mean(axis=0)
+
+    def columns(self):
+        return self.expr.columns()
+
+
+def yoy(header):
+    """ Change in a column since the previous year """
+    return Column(header) - Column(header, years_back=1)
+
+
+def share(header):
+    """ A column as a fraction of the 'All Constituents' total """
+    return Share(Column(header))
+
+
+def mean(header, years):
+    """ Average of a column over the given number of years, ending with the current one """
+    return Mean(Column(header), years)
+
+
+class DerivedColumn:
+    def __init__(self, header, expression, number_format):
+        """
+        Args:
+            header: name of the column, matched against template headers like a workbook column
+            expression: Expr to evaluate
+            number_format: excel number format for the values, e.g. '0', '0.0%' or '£0.00'
+        """
+        self.header = header
+        self.expression = expression
+        self.number_format = number_format
+
+
+# Derived columns added to every book that has the columns they need, see the module docstring for examples
+DERIVED_COLUMNS = []
+
+
+class _Context:
+    """
+    Numeric columns of a book as arrays, cached so an expression reading a column many times only converts it once
+    """
+
+    def __init__(self, book):
+        self.book = book
+        self._columns = {}
+        self._alignments = {}
+
+    def size(self, year):
+        return len(self.book.sheets[year].constituencies)
+
+    def column(self, header, source_year, year):
+        """
+        Returns:
+            The column of source_year lined up with the constituencies of year, NaN where there's no value
+        """
+        if source_year not in self.book.sheets or not self.book.sheets[source_year].column_exists(header):
+            return np.full(self.size(year), np.nan)
+
+        key = (cf.fmt(header), source_year)
+        if key not in self._columns:
+            self._columns[key] = np.array(self.book.sheets[source_year].raw_column(header), dtype=float)
+
+        return self.align(self._columns[key], source_year, year)
+
+    def align(self, values, source_year, year):
+        """
+        Reorder a source_year array into the constituency order of year
+        """
+        if source_year == year:
+            return values
+
+        if (source_year, year) not in self._alignments:
+            rows = {c: idx for idx, c in enumerate(self.book.sheets[source_year].constituencies)}
+            self._alignments[(source_year, year)] = np.array(
+                [rows.get(c, -1) for c in self.book.sheets[year].constituencies], dtype=int)
+
+        idx = self._alignments[(source_year, year)]
+        if not values.size:
+            return np.full(idx.shape, np.nan)
+
+        return np.where(idx >= 0, values[idx], np.nan)
+
+
+def apply_derived_columns(book, derived_columns):
+    """
+    Evaluate derived columns and add them to each year's sheet
+
+    Args:
+        book: loaded ExcelBook
+        derived_columns: list of DerivedColumn
+    """
+    context = _Context(book)
+
+    for derived in derived_columns:
+        # a real column of that name in any year wins, so a year never ends up with both
+        if any(sheet.column_exists(derived.header) for sheet in book.sheets.values()):
+            continue
+
+        if not all(any(sheet.column_exists(h) for sheet in book.sheets.values())
+                   for h in derived.expression.columns()):
+            continue
+
+        for year in book.years:
+            with np.errstate(divide="ignore", invalid="ignore"):
+                values = derived.expression.evaluate(context, year)
+
+            values = [float(v) if np.isfinite(v) else None for v in values]
+            book.sheets[year].add_column(derived.header, values, derived.number_format)
@@ -0,0 +1,212 @@
+from PyQt4.QtCore import QAbstractItemModel, QModelIndex, Qt
+
+
+class _Node:
+    """
+    A row in the diagnostics tree
+
+    Children are described by a list of keys and a factory, and are only turned into nodes when the view asks for them
+    through fetchMore, i.e. when the node is expanded or scrolled into view
+    """
+
+    def __init__(self, parent, row, label, tooltip=None, child_count=0, child_keys=None, make_child=None):
+        """
+        Args:
+            parent: parent node, None for the root
+            row: row of this node within its parent
+            label: text to display
+            tooltip: optional tooltip text
+            child_count: number of children, used so the view can draw expanders without loading the children
+            child_keys: callable returning the list of keys used to build the children, only called on first fetch
+            make_child: callable (parent, row, key) returning a child node
+        """
+        self.parent = parent
+        self.row = row
+        self.label = label
+        self.tooltip = tooltip
+        self.child_count = child_count
+        self.children = []
+
+        self._child_keys = child_keys
+        self._keys = None
+        self._make_child = make_child
+
+    def can_fetch_more(self):
+        return len(self.children) < self.child_count
+
+    def fetch(self, amount):
+        """
+        Build up to 'amount' more children
+
+        Returns:
+            Tuple of the first and last row added
+        """
+        if self._keys is None:
+            self._keys = self._child_keys()
+
+        first = len(self.children)
+        last = min(first + amount, self.child_count) - 1
+        for row in range(first, last + 1):
+            self.children.append(self._make_child(self, row, self._keys[row]))
+
+        return first, last
+
+
+def _leaf(parent, row, label):
+    return _Node(parent, row, label)
+
+
+class CellDiagnosticsModel(QAbstractItemModel):
+    """
+    Lazy tree model for the issues panel: dodgy cells, empty cells and template columns missing from the excel sheet
+
+    The cell sections are read straight from the per-sheet CellBitmaps, and rows are only created for the parts of the
+    tree the user has expanded, so a sparse workbook with a huge number of empty cells costs the same to show as a
+    clean one
+    """
+
+    FETCH_BATCH = 256
+
+    DODGY_LABEL = "Cells with possible errors"
+    DODGY_TOOLTIP = "Cells that couldn't be decoded but aren't empty. Most likely a space"
+    EMPTY_LABEL = "Empty cells"
+    MISSING_LABEL = "Table columns not in the Excel sheet"
+
+    def __init__(self, parent=None):
+        QAbstractItemModel.__init__(self, parent)
+        self._dodgy_cells = {}
+        self._empty_cells = {}
+        self._missing_columns = []
+        self._root = None
+
+        self._build_root()
+
+    def set_cell_diagnostics(self, dodgy_cells, empty_cells):
+        """
+        Args:
+            dodgy_cells: dict of years mapped to CellBitmap, as returned by ExcelBook.get_dodgy_cells
+            empty_cells: dict of years mapped to CellBitmap, as returned by ExcelBook.get_empty_cells
+        """
+        self.beginResetModel()
+        self._dodgy_cells = dodgy_cells
+        self._empty_cells = empty_cells
+        self._build_root()
+        self.endResetModel()
+
+    def set_missing_columns(self, columns):
+        """
+        Args:
+            columns: list of template column headers not found in the excel sheet
+        """
+        self.beginResetModel()
+        self._missing_columns = list(columns)
+        self._build_root()
+        self.endResetModel()
+
+    def _build_root(self):
+        self._root = _Node(None, 0, "")
+        self._root.children = [
+            self._cell_section(0, self.DODGY_LABEL, self.DODGY_TOOLTIP, self._dodgy_cells),
+            self._cell_section(1, self.EMPTY_LABEL, None, self._empty_cells),
+            self._missing_section(2),
+        ]
+        self._root.child_count = len(self._root.children)
+
+    def _cell_section(self, row, label, tooltip, bitmaps):
+        years = list(bitmaps)
+        total = sum(bitmaps[year].count for year in years)
+        if total:
+            label = "{} ({})".format(label, total)
+
+        return _Node(self._root, row, label, tooltip, len(years), lambda: years,
+                     lambda parent, r, year: self._year_node(parent, r, year, bitmaps[year]))
+
+    def _year_node(self, parent, row, year, bitmap):
+        rows = bitmap.rows()
+        return _Node(parent, row, "{} ({})".format(year, bitmap.count), None, len(rows), lambda: rows,
+                     lambda p, r, sheet_row: self._constituency_node(p, r, bitmap, sheet_row))
+
+    @staticmethod
+    def _constituency_node(parent, row, bitmap, sheet_row):
+        label = "{} ({})".format(bitmap.row_labels[sheet_row], bitmap.row_count(sheet_row))
+        return _Node(parent, row, label, None, bitmap.row_count(sheet_row), lambda: bitmap.columns(sheet_row),
+                     lambda p, r, col: _leaf(p, r, str(bitmap.column_labels[col]).replace("\n", " ")))
+
+    def _missing_section(self, row):
+        columns = self._missing_columns
+        return _Node(self._root, row, self.MISSING_LABEL, None, len(columns), lambda: columns, _leaf)
+
+    def _node(self, index):
+        if index.isValid():
+            return index.internalPointer()
+        return self._root
+
+    def index(self, row, column, parent=QModelIndex()):
+        node = self._node(parent)
+        if column != 0 or row < 0 or row >= len(node.children):
+            return QModelIndex()
+
+        return self.createIndex(row, column, node.children[row])
+
+    def parent(self, index):
+        if not index.isValid():
+            return QModelIndex()
+
+        parent = index.internalPointer().parent
+        if parent is None or parent is self._root:
+            return QModelIndex()
+
+        return self.createIndex(parent.row, 0, parent)
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.column() > 0:
+            return 0
+        return len(self._node(parent).children)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 1
+
+    def hasChildren(self, parent=QModelIndex()):
+        return self._node(parent).child_count > 0
+
+    def canFetchMore(self, parent):
+        return self._node(parent).can_fetch_more()
+
+    def fetchMore(self, parent):
+        node = self._node(parent)
+        if not node.can_fetch_more():
+            return
+
+        first = len(node.children)
+        last = min(first + self.FETCH_BATCH, node.child_count) - 1
+        self.beginInsertRows(parent, first, last)
+        node.fetch(self.FETCH_BATCH)
+        self.endInsertRows()
+
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.NoItemFlags
+
+        node = index.internalPointer()
+        if node.parent is self._root and not node.child_count:
+            # empty sections are shown greyed out
+            return Qt.NoItemFlags
+
+        return Qt.ItemIsEnabled
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+
+        node = index.internalPointer()
+        if role == Qt.DisplayRole:
+            return node.label
+        elif role == Qt.ToolTipRole:
+            return node.tooltip
+
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole and section == 0:
+            return "Issues"
+        return None
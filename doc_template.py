@@ -1,8 +1,8 @@
 import column_name_formatter as cf
-from docx import Document
-from docx.shared import Pt
-from docx.enum.style import WD_STYLE_TYPE
+from compiled_template import CompiledTemplate
+from template_index import TemplateIndex
 
+import io
 import ntpath
 
 import os
@@ -11,36 +11,37 @@ from PyQt4.QtCore import QObject, pyqtSignal
 
 
 class DocTable:
-    def __init__(self, table_ref):
+    def __init__(self, table_ref, table_index):
+        """
+        Args:
+            table_ref: python-docx Table
+            table_index: TableIndex of the same table, which has already worked out the cell of every row and column
+        """
         self._table = table_ref
         self.cell_style = None
 
-        header_cells = self._table.rows[0].cells[1:]
-        self.headers = [h.text for h in header_cells]
+        self.headers = table_index.headers
         self._standard_headers = [cf.fmt(h) for h in self.headers]
-        self.years = []
+        self.years = table_index.years
+
+        self._column_header_map = table_index.column_map
 
-        self._column_header_map = {cf.fmt(h): idx + 1 for idx, h in enumerate(self.headers)}
+        self._year_map = table_index.year_rows  # year to the row's w:tc elements
 
-        self._year_map = {}
-        self._generate_mappings()
+    def get_cell(self, year, standard_column_header):
+        from docx.table import _Cell
 
-    def _generate_mappings(self):
-        rows = self._table.rows
-        if rows and len(rows) > 1:
-            rows = rows[1:]
-            for idx, row in enumerate(rows):
-                year = row.cells[0].text
-                self.years.append(year)
-                self._year_map[year] = row.cells
+        cells = self._year_map[year]
+        column = self._column_header_map[standard_column_header]
+        return _Cell(cells[column], self._table)
 
     def set_value(self, year, standard_column_header, value):
         """
         Set a table cells value
         """
-        cells = self._year_map[year]
-        column = self._column_header_map[standard_column_header]
-        cell = cells[column]
+        from docx.shared import Pt
+
+        cell = self.get_cell(year, standard_column_header)
 
         cell.text = value
         p = cell.paragraphs[0]
@@ -72,37 +73,77 @@ class DocTemplate(QObject):
         self.loaded = False
         self.all_headers = []
         self.path = ""
+        self.compiled = None
+        self._index = None
 
-    def load(self, path):
+    def load(self, path, compile_template=True):
         self.started.emit()
 
         if not path:
             self.loaded = False
         else:
             self.path = path
-            self._doc = Document(self.path)
+            self._open(self.path)
             self.name = ntpath.basename(self.path)
+            self.compiled = self._compile() if compile_template else None
+
+            self.loaded = True
 
-            self._styles = self._doc.styles
-            self._add_style("Title", is_bold=True, size=18)
-            self._add_style("CellStyle", is_bold=False, size=16)
+        self.finished.emit()
 
-            self._table_map = {}
-            self.tables = []
+    def _open(self, source):
+        """
+        Parse the document and index its tables
 
-            self._init_tables()
+        Args:
+            source: path or file-like object of the .docx
+        """
+        # python-docx is slow to import, so it's left until the first template is opened
+        from docx import Document
 
-            self.loaded = True
+        self._doc = Document(source)
 
-        self.finished.emit()
+        self._styles = self._doc.styles
+        self._add_style("Title", is_bold=True, size=18)
+        self._add_style("CellStyle", is_bold=False, size=16)
+
+        self._table_map = {}
+        self.tables = []
+        self.all_headers = []
+
+        self._init_tables()
+
+    def _compile(self):
+        """
+        Build the byte-level renderer for this template
+
+        A shadow copy of the document is filled with markers through the normal set_value/set_title calls so the
+        compiled output is exactly what python-docx would write
+
+        Returns:
+            CompiledTemplate, or None if the template can't be compiled
+        """
+        source = io.BytesIO()
+        self._doc.save(source)
+
+        shadow = DocTemplate()
+        shadow._open(io.BytesIO(source.getvalue()))
+
+        try:
+            return CompiledTemplate(source.getvalue(), shadow)
+        except ValueError:
+            return None
 
     def has_column(self, column):
-        return cf.fmt(column) in [cf.fmt(h) for h in self.all_headers]
+        return self._index is not None and cf.fmt(column) in self._index.standard_headers
 
     def get_all_headers(self):
         return self.all_headers
 
     def _add_style(self, name, is_bold, size):
+        from docx.enum.style import WD_STYLE_TYPE
+        from docx.shared import Pt
+
         if self._styles and name not in self._styles:
             charstyle = self._styles.add_style(name, WD_STYLE_TYPE.PARAGRAPH)
             font = charstyle.font
@@ -111,9 +152,12 @@ class DocTemplate(QObject):
             font.name = "Arial"
 
     def _init_tables(self):
+        # python-docx re-resolves merged cells on every rows[i].cells, so the layout is read from the xml once instead
+        self._index = TemplateIndex(self._doc.element.body)
+
         tables = self._doc.tables
-        for table in tables:
-            doc_table = DocTable(table)
+        for table, table_index in zip(tables, self._index.tables):
+            doc_table = DocTable(table, table_index)
             self.tables.append(doc_table)
 
             doc_table.cell_style = self._doc.styles["CellStyle"]
@@ -122,6 +166,17 @@ class DocTemplate(QObject):
                 self._table_map[cf.fmt(h)] = doc_table
                 self.all_headers.append(h)
 
+    def iter_slots(self):
+        """
+        Yields every cell that write_data can fill
+
+        Returns:
+            Generator of (year, standard column name, DocTable, cell)
+        """
+        for (year, standard_name) in self._index.slots:
+            table = self._table_map[standard_name]
+            yield year, standard_name, table, table.get_cell(year, standard_name)
+
     def set_title(self, constituent):
         if self._doc:
             paragraphs = self._doc.paragraphs
@@ -131,6 +186,8 @@ class DocTemplate(QObject):
             new_p.alignment = 1
             new_p.style = self._doc.styles["Title"]
 
+            return new_p
+
     def write_data(self, year, column_header, value):
         standard_name = cf.fmt(column_header)
         if standard_name in self._table_map:
@@ -139,3 +196,13 @@ class DocTemplate(QObject):
 
     def save(self, path):
         self._doc.save(path)
+
+    def document_xml(self):
+        """
+        Returns:
+            Tuple of the zip member name of the main document part and its serialised xml
+        """
+        from docx.opc.oxml import serialize_part_xml
+
+        part = self._doc.part
+        return part.partname.lstrip("/"), serialize_part_xml(part.element)
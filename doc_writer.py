@@ -1,27 +1,155 @@
+import column_name_formatter as cf
 from doc_template import DocTemplate
+import io
 import os
+import uuid
 
 
-def write_doc(constituency, excel_book, template):
-    data_written = False
-    constituency_data = excel_book.get_constituency_data(constituency)
+def build_values(constituency_data):
+    """
+    Flatten a constituency's data into the cell text to write
 
-    d = DocTemplate()
-    d.load(template.path)
+    Args:
+        constituency_data: dictionary of years mapped to a dictionary of column headers mapped to values, as returned
+            by ExcelBook.get_constituency_data
 
+    Returns:
+        Dictionary of (year, standard column name) mapped to the text for the cell
+    """
+    values = {}
     for year in constituency_data:
         year_data = constituency_data[year]
 
         for column_header in year_data:
-            data_written = True
             value = year_data[column_header]
             if value:
-                d.write_data(year, column_header, value.formatted)
+                values[(year, cf.fmt(column_header))] = value.formatted
             else:
-                d.write_data(year, column_header, "-")
+                values[(year, cf.fmt(column_header))] = "-"
+
+    return values
+
+
+def render_doc(constituency, excel_book, template):
+    """
+    Fill the template with a constituency's data
+
+    Args:
+        constituency: name of the constituency
+        excel_book: loaded ExcelBook
+        template: loaded DocTemplate
+
+    Returns:
+        Bytes of the .docx, or None if there's no data for the constituency
+    """
+    values = build_values(excel_book.get_constituency_data(constituency))
+    if not values:
+        return None
+
+    return render_values(constituency, values, template)
+
+
+def render_values(constituency, values, template):
+    """
+    Fill the template with values already pulled from the excel book
+
+    Args:
+        constituency: name of the constituency, used for the title
+        values: dictionary from build_values
+        template: loaded DocTemplate
+
+    Returns:
+        Bytes of the .docx
+    """
+    if template.compiled:
+        return template.compiled.render(constituency, values)
+
+    d = DocTemplate()
+    d.load(template.path, compile_template=False)
+
+    for (year, standard_name), value in values.items():
+        d.write_data(year, standard_name, value)
+
+    d.set_title(constituency)
+
+    out = io.BytesIO()
+    d.save(out)
+    return out.getvalue()
+
+
+def output_dirs(templates, output_dir="Constituencies"):
+    """
+    Where each loaded template's documents go, see template_dirs
+
+    Returns:
+        List of directories, one per template
+    """
+    return template_dirs([t.name for t in templates], output_dir)
+
+
+def template_dirs(names, output_dir="Constituencies"):
+    """
+    Where each template's documents go. A single template writes straight into output_dir, several templates get a
+    folder each named after the template file. Templates with the same file name from different folders are numbered,
+    e.g. 'summary' and 'summary (2)', so they don't overwrite each other
+
+    Args:
+        names: file names of the templates
+        output_dir: root folder for the documents
+
+    Returns:
+        List of directories, one per template
+    """
+    if len(names) == 1:
+        return [output_dir]
+
+    dirs = []
+    used = set()
+    for file_name in names:
+        base = os.path.splitext(file_name)[0]
+        name = base
+        count = 1
+        # folder names aren't case sensitive on windows
+        while name.lower() in used:
+            count += 1
+            name = "{} ({})".format(base, count)
+
+        used.add(name.lower())
+        dirs.append(os.path.join(output_dir, name))
+
+    return dirs
+
+
+def write_docs(constituency, excel_book, templates, output_dir="Constituencies"):
+    """
+    Write a constituency's document for every template, pulling its data from the excel book only once
+
+    Args:
+        constituency: name of the constituency
+        excel_book: loaded ExcelBook
+        templates: list of loaded DocTemplates
+        output_dir: root folder for the documents, see output_dirs
+    """
+    values = build_values(excel_book.get_constituency_data(constituency))
+
+    if values:
+        for template, directory in zip(templates, output_dirs(templates, output_dir)):
+            data = render_values(constituency, values, template)
+
+            # several processes may write into the same folders, and a half written document is never left behind
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, constituency + ".docx")
+            tmp = "{}.tmp-{}".format(path, uuid.uuid4().hex)
+            try:
+                with open(tmp, "wb") as f:
+                    f.write(data)
+
+                os.replace(tmp, path)
+            except BaseException:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+                raise
+
 
-    if data_written:
-        if not os.path.exists("Constituencies"):
-            os.mkdir("Constituencies")
-        d.set_title(constituency)
-        d.save(os.path.join("Constituencies", constituency + ".docx"))
\ No newline at end of file
+def write_doc(constituency, excel_book, template, output_dir="Constituencies"):
+    write_docs(constituency, excel_book, [template], output_dir)
@@ -1,17 +1,38 @@
 import column_name_formatter as cf
+import concurrent.futures
+import math
 import ntpath
-import openpyxl
-import openpyxl.utils
+import os
+import zipfile
+
+from xml.etree import ElementTree
 
 from PyQt4.QtCore import QObject, pyqtSignal
 
+_SHEET_TAG = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}sheet"
+
+# seconds between checks for a cancelled load while waiting on the sheet workers
+_CANCEL_POLL_INTERVAL = 0.1
+
+# Kinds of cell found by classify_column
+CELL_NUMERIC = 0
+CELL_ZERO = 1
+CELL_BLANK = 2
+CELL_WHITESPACE = 3
+CELL_TEXT = 4  # any other string, or a type that can't be formatted such as a date
+
+# excel TRUE/FALSE read as 1/0, like they always have been
+_KIND_BY_TYPE = {int: CELL_NUMERIC, float: CELL_NUMERIC, bool: CELL_NUMERIC, type(None): CELL_BLANK, str: CELL_TEXT}
+
 
 class Value:
+    __slots__ = ("raw", "formatting", "formatted")
+
     def __init__(self, raw, format):
         self.raw = raw
-        self.formatting = format
+        self.formatting = format or "General"
 
-        self.formatted = format_value(raw, format)
+        self.formatted = format_value(raw, self.formatting)
 
 
 class CellRef:
@@ -25,59 +46,202 @@ class CellRef:
         self.sheet_column = sheet_col
 
 
+class CellBitmap:
+    """
+    One bit per cell of a sheet's value array, used to flag cells (empty, dodgy, ...) without storing header strings
+
+    Bits are stored row-major, rows being constituencies and columns being column headers in the same order as the
+    sheet's value array. Counts are kept as bits are set so the totals are available without scanning the bitmap
+    """
+
+    def __init__(self, row_labels, column_labels):
+        """
+        Args:
+            row_labels: list of constituencies, shared with the sheet
+            column_labels: list of raw column headers, shared with the sheet
+        """
+        self.row_labels = row_labels
+        self.column_labels = column_labels
+        self.num_rows = len(row_labels)
+        self.num_columns = len(column_labels)
+        self.count = 0
+
+        self._bits = bytearray((self.num_rows * self.num_columns + 7) // 8)
+        self._row_counts = [0] * self.num_rows
+
+    def __bool__(self):
+        return self.count > 0
+
+    def __len__(self):
+        return self.count
+
+    def set(self, row, column):
+        bit = row * self.num_columns + column
+        mask = 1 << (bit & 7)
+        if not self._bits[bit >> 3] & mask:
+            self._bits[bit >> 3] |= mask
+            self._row_counts[row] += 1
+            self.count += 1
+
+    def is_set(self, row, column):
+        bit = row * self.num_columns + column
+        return bool(self._bits[bit >> 3] & (1 << (bit & 7)))
+
+    def row_count(self, row):
+        return self._row_counts[row]
+
+    def rows(self):
+        """
+        Returns:
+            List of the row indexes that have at least one bit set
+        """
+        return [row for row, count in enumerate(self._row_counts) if count]
+
+    def columns(self, row):
+        """
+        Returns:
+            List of the column indexes that are set in a row
+        """
+        if not self._row_counts[row]:
+            return []
+
+        start = row * self.num_columns
+        bits = self._bits
+        return [col for col in range(self.num_columns)
+                if bits[(start + col) >> 3] & (1 << ((start + col) & 7))]
+
+    def to_dict(self):
+        """
+        Expand the bitmap into constituencies mapped to a list of raw headers. Only meant for small sheets or debugging
+
+        Returns:
+            Dict of constituencies mapped to a list of headers
+        """
+        return {self.row_labels[row]: [self.column_labels[col] for col in self.columns(row)] for row in self.rows()}
+
+
 class ExcelBook(QObject):
     started = pyqtSignal()
     finished = pyqtSignal()
 
     progress = pyqtSignal('QString', int)
 
-    def __init__(self):
+    def __init__(self, max_workers=None, derived_columns=None):
+        """
+        Args:
+            max_workers: number of processes used to read sheets, defaults to the number of cores
+            derived_columns: list of DerivedColumn to compute after loading, defaults to DERIVED_COLUMNS
+        """
         QObject.__init__(self)
         self.sheets = {}
         self.years = []
         self.name = ""
         self.loaded = False
-        self._book = None
+        self.max_workers = max_workers
+        self.derived_columns = derived_columns
 
-    def load(self, path):
+    def load(self, path, cancelled=None):
+        """
+        Args:
+            path: path to the workbook
+            cancelled: function returning True once the load is no longer wanted, it's then stopped between sheets
+                and the sheets not started yet are dropped
+
+        Returns:
+            True if the book loaded
+        """
         self.started.emit()
         out = False
+        names = None
 
         try:
             self.progress.emit("Loading book...", 0)
-            self._book = openpyxl.load_workbook(path, data_only=True)
+            names = read_sheet_names(path)
         except FileNotFoundError:
             pass
 
-        if self._book:
+        if names:
             self.years = []
             self.name = ntpath.basename(path)
 
-            names = self._book.sheetnames
+            sheet_names = {}
             for n in names:
                 try:
                     year = int(n)
                     self.years.append(str(year))
+                    sheet_names[str(year)] = n
                 except ValueError:
                     pass
 
             if self.years:
                 ctr = 0
 
-                self.sheets = {}
-                for year in self.years:
-                    sheet = self._book.get_sheet_by_name(year)
-                    self.sheets[year] = ExcelSheet(year, sheet)
+                sheets = {}
+                for year, sheet in self._extract_sheets(path, sheet_names, cancelled):
+                    sheets[year] = sheet
                     ctr += 1
                     self.progress.emit("Sheet {} loaded".format(year), int(0.5 + (100.0 * ctr) / len(self.years)))
 
-                out = True
+                if len(sheets) == len(self.years):
+                    self.sheets = {year: sheets[year] for year in self.years}
+                    self._add_derived_columns()
+
+                    out = True
 
         self.loaded = out
         self.finished.emit()
 
         return out
 
+    def _add_derived_columns(self):
+        # numpy is only needed from here on, so it's imported on the first load
+        import derived_columns
+
+        columns = derived_columns.DERIVED_COLUMNS if self.derived_columns is None else self.derived_columns
+        if columns:
+            self.progress.emit("Computing derived columns...", 100)
+            derived_columns.apply_derived_columns(self, columns)
+
+    def _extract_sheets(self, path, sheet_names, cancelled=None):
+        """
+        Build the ExcelSheet for each year, spread over a process pool when there's more than one sheet
+
+        Each worker opens the workbook in read-only mode, so it only streams its own worksheet, and sends back the
+        finished ExcelSheet
+
+        Args:
+            path: path to the workbook
+            sheet_names: dict of years mapped to the sheet name in the workbook
+            cancelled: see load, stops the generator early
+
+        Returns:
+            Generator of (year, ExcelSheet) in the order the sheets finish
+        """
+        workers = min(len(sheet_names), self.max_workers or os.cpu_count() or 1)
+
+        if workers <= 1:
+            for year, name in sheet_names.items():
+                if cancelled is not None and cancelled():
+                    return
+
+                yield year, extract_sheet(path, year, name)
+        else:
+            pool = concurrent.futures.ProcessPoolExecutor(max_workers=workers)
+            try:
+                futures = {pool.submit(extract_sheet, path, year, name): year for year, name in sheet_names.items()}
+                pending = set(futures)
+                while pending:
+                    done, pending = concurrent.futures.wait(pending, timeout=_CANCEL_POLL_INTERVAL,
+                                                            return_when=concurrent.futures.FIRST_COMPLETED)
+                    if cancelled is not None and cancelled():
+                        return
+
+                    for future in done:
+                        yield futures[future], future.result()
+            finally:
+                # sheets already being read can't be interrupted, but nothing new is started and nobody waits on them
+                pool.shutdown(wait=False, cancel_futures=True)
+
     def get_data(self, year, constituency, column_name):
         """
         Return a single data value from a constituency given the year and column header
@@ -142,10 +306,10 @@ a
         Returns the cells that contain no data
 
         Returns:
-            Dict of years mapped to constituencies mapped to a list headers
+            Dict of years mapped to a CellBitmap over that year's values. Years with no empty cells are left out
 
         ex: empty_cells = doc.get_empty_cells()
-            print(empty_cells["2012"])
+            print(empty_cells["2012"].to_dict())
                 "Angus": [empty_column1, empty_column2],
                 "another place": [empty_column1, empty_column3]
         """
@@ -156,10 +320,10 @@ a
         Returns the cells that were flagged as having data that couldn't be formatted for any reason
 
         Returns:
-            Dict of years mapped to constituencies mapped to a list headers
+            Dict of years mapped to a CellBitmap over that year's values. Years with no dodgy cells are left out
 
         ex: dodgy_cells = doc.get_dodgy_cells()
-            print(dodgy_cells["2012"])
+            print(dodgy_cells["2012"].to_dict())
                 "Angus": [dodgy_column1, dodgy_column2],
                 "another place": [dodgy_column1, dodgy_column3]
         """
@@ -174,6 +338,63 @@ a
             return False
 
 
+class SheetGrid:
+    """
+    The values and number formats of a worksheet, pulled out in one streaming pass
+
+    Rows and columns are 1-based like openpyxl. Cells outside the used range read as None
+    """
+
+    def __init__(self, values, formats):
+        """
+        Args:
+            values: list of rows, each a list of cell values
+            formats: list of rows, each a list of the cells number formats
+        """
+        self._values = values
+        self._formats = formats
+        self.max_row = len(values)
+        self.max_column = max((len(row) for row in values), default=0)
+
+    @classmethod
+    def from_worksheet(cls, sheet):
+        values = []
+        formats = []
+        sheet.reset_dimensions()
+        for row in sheet.iter_rows():
+            values.append([cell.value for cell in row])
+            # cells missing from a sparse sheet come back as EmptyCell, whose number format is None
+            formats.append([cell.number_format or "General" for cell in row])
+
+        # read-only sheets pad rows with empty cells, trim them so max_row/max_column match the data
+        while values and not any(v is not None for v in values[-1]):
+            values.pop()
+            formats.pop()
+
+        return cls(values, formats)
+
+    def value(self, row, column):
+        if row > self.max_row:
+            return None
+
+        values = self._values[row - 1]
+        return values[column - 1] if column <= len(values) else None
+
+    def column(self, column, rows):
+        """
+        Returns:
+            List of the values in a column for the given rows
+        """
+        return [self.value(row, column) for row in rows]
+
+    def number_format(self, row, column):
+        if row > self.max_row:
+            return "General"
+
+        formats = self._formats[row - 1]
+        return formats[column - 1] if column <= len(formats) else "General"
+
+
 class ExcelSheet:
     """
     Encapsulates an excel sheet and allows access to a constituencies data
@@ -192,16 +413,22 @@ class ExcelSheet:
     MAX_STARTING_COLUMN = 8
     MAX_STARTING_ROW = 16
 
+    TOTAL_ROW_NAMES = ["Total Clients", "All Constituents"]
+
     def __init__(self, name, sheet):
         """
         Read all data form the sheet and stores it in a 2D array of formatted strings
+
+        Args:
+            name: year of the sheet
+            sheet: SheetGrid of the worksheet
         """
 
         self.name = name
         self.constituencies = []
         self.column_headers = []  # raw names for public use
-        self.empty_cells = {}  # cells with no data in them, uses raw names
-        self.dodgy_cells = {}  # cells that aren't ints or floats, need to be checked for errors manually, raw names
+        self.empty_cells = CellBitmap([], [])  # cells with no data in them
+        self.dodgy_cells = CellBitmap([], [])  # cells that aren't ints or floats, need to be checked manually
 
         self._constituency_map = {}  # map of constituent names to CellRef
         self._column_header_map = {}  # column names to CellRef, uses standard name for mappings
@@ -269,7 +496,7 @@ class ExcelSheet:
         different from max_row due to extra notes at the bottom of the sheet
 
         Args:
-            sheet: reference to worksheet
+            sheet: SheetGrid of the worksheet
 
         Returns:
             Tuple with row and column of location of the 'Constituency' cell.
@@ -282,7 +509,7 @@ class ExcelSheet:
 
         for column in range(1, max_col + 1):
             for row in range(1, max_row + 1):
-                cell_value = sheet.cell(row=row, column=column).value
+                cell_value = sheet.value(row, column)
                 if cell_value and str(cell_value).strip() in ["Constituency", "Local Authority"]:
                     limits = {"start-row": row, "start-column": column}
                     break
@@ -293,8 +520,8 @@ class ExcelSheet:
         if limits:
             limits["end-column"] = sheet.max_column
             for row in range(sheet.max_row, limits["start-row"], -1):
-                constituent = sheet.cell(row=row, column=limits["start-column"]).value
-                if constituent and str(constituent).strip() in ["Total Clients", "All Constituents"]:
+                constituent = sheet.value(row, limits["start-column"])
+                if constituent and str(constituent).strip() in self.TOTAL_ROW_NAMES:
                     limits["end-row"] = row
 
             if "end-row" not in limits:
@@ -309,7 +536,7 @@ class ExcelSheet:
         The order in which they appear define the indexes
 
         Args:
-            sheet: reference to worksheet
+            sheet: SheetGrid of the worksheet
         """
         column = self._data_limits["start-column"]
         start_row = self._data_limits["start-row"] + 1
@@ -317,7 +544,7 @@ class ExcelSheet:
 
         idx = 0
         for row in range(start_row, end_row):
-            constituent = sheet.cell(row=row, column=column).value
+            constituent = sheet.value(row, column)
 
             self.constituencies.append(constituent)
             self._constituency_map[constituent] = CellRef(idx=idx, sheet_row=row, sheet_col=column)
@@ -330,7 +557,7 @@ class ExcelSheet:
         The order in which they appear define the indexes
 
         Args:
-            sheet: reference to worksheet
+            sheet: SheetGrid of the worksheet
         """
         row_idx = self._data_limits["start-row"]
         start_column = self._data_limits["start-column"] + 1
@@ -338,10 +565,10 @@ class ExcelSheet:
 
         idx = 0
         for column_idx in range(start_column, end_column):
-            raw_column_header = sheet.cell(row=row_idx, column=column_idx).value
+            raw_column_header = sheet.value(row_idx, column_idx)
             if raw_column_header:
                 standard_name = cf.fmt(raw_column_header)
-                column_format = sheet.cell(row=row_idx + 1, column=column_idx).number_format
+                column_format = sheet.number_format(row_idx + 1, column_idx)
 
                 self.column_headers.append(raw_column_header)
                 self._column_header_map[standard_name] = CellRef(idx=idx, sheet_row=row_idx, sheet_col=column_idx)
@@ -353,46 +580,156 @@ class ExcelSheet:
         Build a 2D grid of formatted strings that represent the excel data to be put into the word docs
 
         Args:
-            sheet: reference to excel worksheet
+            sheet: SheetGrid of the worksheet
         """
         self._values = [[None] * len(self.column_headers) for _ in range(0, len(self.constituencies))]
+        self.empty_cells = CellBitmap(self.constituencies, self.column_headers)
+        self.dodgy_cells = CellBitmap(self.constituencies, self.column_headers)
 
-        for constituency in self.constituencies:
-            cell_ref = self._constituency_map[constituency]
-            row_idx = cell_ref.idx
-            sheet_row = cell_ref.sheet_row
+        row_refs = [self._constituency_map[constituency] for constituency in self.constituencies]
+        sheet_rows = [cell_ref.sheet_row for cell_ref in row_refs]
 
-            for raw_header in self.column_headers:
-                standard_name = cf.fmt(raw_header)
+        for raw_header in self.column_headers:
+            standard_name = cf.fmt(raw_header)
+            column_format = self._format_map[standard_name]
 
-                col_idx = self._column_header_map[standard_name].idx
-                sheet_column = self._column_header_map[standard_name].sheet_column
+            col_idx = self._column_header_map[standard_name].idx
+            sheet_column = self._column_header_map[standard_name].sheet_column
 
-                cell_value = sheet.cell(row=sheet_row, column=sheet_column).value
+            column = sheet.column(sheet_column, sheet_rows)
+            kinds = classify_column(column)
 
-                if cell_value:
-                    try:
-                        value = Value(cell_value, self._format_map[standard_name])
-                        self._values[row_idx][col_idx] = value
-                    except TypeError:
-                        # Most cells are either ints, floats or empty
-                        # Some seem to be 1-length strings though and so may need to be looked at
-                        self._values[row_idx][col_idx] = ""
-                        if constituency not in self.dodgy_cells:
-                            self.dodgy_cells[constituency] = []
+            for cell_ref, cell_value, kind in zip(row_refs, column, kinds):
+                row_idx = cell_ref.idx
 
-                        self.dodgy_cells[constituency].append(raw_header)
-                else:
+                if kind <= CELL_ZERO:
+                    self._values[row_idx][col_idx] = Value(cell_value, column_format)
+                elif kind == CELL_BLANK:
                     # saving empty columns to display later
                     self._values[row_idx][col_idx] = ""
-                    if constituency not in self.empty_cells:
-                        self.empty_cells[constituency] = []
-
-                    self.empty_cells[constituency].append(raw_header)
+                    self.empty_cells.set(row_idx, col_idx)
+                else:
+                    # Most cells are either ints, floats or empty
+                    # Some seem to be 1-length strings though and so may need to be looked at
+                    self._values[row_idx][col_idx] = ""
+                    self.dodgy_cells.set(row_idx, col_idx)
 
     def column_exists(self, column):
         return cf.fmt(column) in self._column_header_map
 
+    def raw_column(self, column_header):
+        """
+        Get the raw numbers of a column, for calculations
+
+        Args:
+            column_header: name of the column header, name is not formatted
+
+        Returns:
+            List with the raw value of each constituency in order, None where the cell is empty or not a number
+        """
+        col_idx = self._column_header_map[cf.fmt(column_header)].idx
+        return [row[col_idx].raw if row[col_idx] else None for row in self._values]
+
+    def total_row(self):
+        """
+        Returns:
+            Index of the 'All Constituents'/'Total Clients' row, or None if the sheet doesn't have one
+        """
+        for idx, constituency in enumerate(self.constituencies):
+            if constituency and str(constituency).strip() in self.TOTAL_ROW_NAMES:
+                return idx
+
+        return None
+
+    def add_column(self, column_header, raw_values, number_format):
+        """
+        Add a column that isn't in the excel sheet, e.g. a derived column. It is then read like any other column
+
+        Args:
+            column_header: raw name of the new column
+            raw_values: list with a number, or None for no value, for each constituency in order
+            number_format: excel number format used to format the values
+        """
+        standard_name = cf.fmt(column_header)
+        col_idx = len(self.column_headers)
+
+        self.column_headers.append(column_header)
+        self._column_header_map[standard_name] = CellRef(idx=col_idx, sheet_row=None, sheet_col=None)
+        self._format_map[standard_name] = number_format
+
+        for row, raw in zip(self._values, raw_values):
+            row.append("" if raw is None else Value(raw, number_format))
+
+
+def classify_column(column):
+    """
+    Sort a column of raw cell values into kinds in one pass, without trying to format each cell
+
+    Args:
+        column: list of raw cell values
+
+    Returns:
+        List of CELL_NUMERIC, CELL_ZERO, CELL_BLANK, CELL_WHITESPACE or CELL_TEXT, one per value. Empty strings are
+        CELL_BLANK, bools are numbers and NaN or infinity is CELL_TEXT. Every CELL_NUMERIC and CELL_ZERO value can be
+        formatted by format_value
+    """
+    kinds = [_KIND_BY_TYPE.get(value.__class__, CELL_TEXT) for value in column]
+
+    for idx, kind in enumerate(kinds):
+        if kind == CELL_NUMERIC:
+            if column[idx] == 0:
+                kinds[idx] = CELL_ZERO
+            elif not math.isfinite(column[idx]):
+                kinds[idx] = CELL_TEXT
+        elif kind == CELL_TEXT and column[idx].__class__ is str:
+            text = column[idx]
+            if not text:
+                kinds[idx] = CELL_BLANK
+            elif text.isspace():
+                kinds[idx] = CELL_WHITESPACE
+
+    return kinds
+
+
+def read_sheet_names(path):
+    """
+    Read the sheet names from the workbook part of an .xlsx without loading any sheets
+
+    Args:
+        path: path to the workbook
+
+    Returns:
+        List of sheet names in workbook order
+    """
+    with zipfile.ZipFile(path) as book:
+        root = ElementTree.fromstring(book.read("xl/workbook.xml"))
+
+    return [sheet.get("name") for sheet in root.iter(_SHEET_TAG)]
+
+
+def extract_sheet(path, year, sheet_name):
+    """
+    Build one year's ExcelSheet straight from the workbook file. Runs in the sheet worker processes
+
+    Args:
+        path: path to the workbook
+        year: year the sheet is for
+        sheet_name: name of the sheet in the workbook
+
+    Returns:
+        ExcelSheet for the year
+    """
+    # only needed here, so the GUI process doesn't pay for importing it
+    import openpyxl
+
+    book = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        grid = SheetGrid.from_worksheet(book[sheet_name])
+    finally:
+        book.close()
+
+    return ExcelSheet(year, grid)
+
 
 def format_value(raw, formatting):
     """
@@ -0,0 +1,164 @@
+import heapq
+import itertools
+import threading
+import traceback
+
+from PyQt4.QtCore import QObject, pyqtSignal
+
+
+class Job:
+    """
+    A unit of work queued on the JobScheduler
+
+    Jobs can be cancelled at any time. A pending job is then dropped from the queue, and a running one has its result
+    thrown away. Long running functions submitted with pass_job can also check 'cancelled' themselves to stop early
+    """
+
+    def __init__(self, fn, args, priority, key, group, on_finished, on_failed, pass_job=False):
+        self.fn = fn
+        self.args = args
+        self.pass_job = pass_job
+        self.priority = priority
+        self.key = key
+        self.group = group
+        self.on_finished = on_finished
+        self.on_failed = on_failed
+        self.cancelled = False
+        self.running = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class JobScheduler(QObject):
+    """
+    Runs work off the GUI thread on a fixed number of worker threads
+
+    Queued jobs are run lowest priority value first, so interactive loads go ahead of batch generation. A job that has
+    the same key as one already queued or running isn't queued again, and submitting a job to a group cancels the
+    other jobs in that group, e.g. loading a new excel file supersedes the one still loading
+
+    Results are handed back on the GUI thread through a queued signal, so the callbacks can touch widgets
+    """
+
+    INTERACTIVE = 0
+    BATCH = 10
+    BACKGROUND = 20
+
+    active_changed = pyqtSignal()
+
+    _job_done = pyqtSignal(object, object, object)
+
+    def __init__(self, max_workers=2, parent=None):
+        QObject.__init__(self, parent)
+        self.max_workers = max_workers
+
+        self._queue = []  # heap of (priority, sequence number, job)
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+        self._workers = []
+        self._active = []  # queued or running jobs, only touched on the GUI thread
+        self._stopping = False
+
+        self._job_done.connect(self._dispatch)
+
+    def submit(self, fn, *args, priority=BATCH, key=None, group=None, on_finished=None, on_failed=None,
+               pass_job=False):
+        """
+        Queue fn(*args) to run on a worker thread. Must be called from the GUI thread
+
+        Args:
+            fn: function to run
+            args: arguments for fn
+            priority: lower runs first, see INTERACTIVE, BATCH and BACKGROUND
+            key: jobs with the same key are only run once at a time, the job already queued is returned instead
+            group: submitting a job cancels every other job in its group
+            on_finished: called on the GUI thread with the return value of fn
+            on_failed: called on the GUI thread with the exception if fn raised
+            pass_job: call fn(job, *args), so a long running fn can check job.cancelled and stop early
+
+        Returns:
+            The Job
+        """
+        if key is not None:
+            for job in self._active:
+                if job.key == key and not job.cancelled:
+                    return job
+
+        if group is not None:
+            self.cancel_group(group)
+
+        job = Job(fn, args, priority, key, group, on_finished, on_failed, pass_job)
+        self._active.append(job)
+
+        with self._condition:
+            heapq.heappush(self._queue, (priority, next(self._counter), job))
+            if len(self._workers) < self.max_workers:
+                worker = threading.Thread(target=self._work, daemon=True)
+                self._workers.append(worker)
+                worker.start()
+
+            self._condition.notify()
+
+        self.active_changed.emit()
+
+        return job
+
+    def cancel_group(self, group):
+        for job in self._active:
+            if job.group == group:
+                job.cancel()
+
+    def is_active(self, group=None):
+        """
+        Returns:
+            True if any job that hasn't been cancelled is queued or running, only counting the group if given
+        """
+        return any(not job.cancelled and (group is None or job.group == group) for job in self._active)
+
+    def shutdown(self):
+        for job in self._active:
+            job.cancel()
+
+        with self._condition:
+            self._stopping = True
+            self._queue = []
+            self._condition.notify_all()
+
+    def _work(self):
+        while True:
+            with self._condition:
+                while not self._queue and not self._stopping:
+                    self._condition.wait()
+
+                if self._stopping:
+                    return
+
+                _, _, job = heapq.heappop(self._queue)
+
+            if job.cancelled:
+                self._job_done.emit(job, None, None)
+                continue
+
+            job.running = True
+            try:
+                args = (job,) + job.args if job.pass_job else job.args
+                self._job_done.emit(job, job.fn(*args), None)
+            except Exception as e:
+                self._job_done.emit(job, None, e)
+
+    def _dispatch(self, job, result, error):
+        job.running = False
+        if job in self._active:
+            self._active.remove(job)
+
+        if not job.cancelled:
+            if error is not None:
+                if job.on_failed:
+                    job.on_failed(error)
+                else:
+                    traceback.print_exception(type(error), error, error.__traceback__)
+            elif job.on_finished:
+                job.on_finished(result)
+
+        self.active_changed.emit()
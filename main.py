@@ -1,14 +1,24 @@
-import os
-import sys
-import threading
+import time
 
-from PyQt4 import QtGui, QtCore, Qt, uic
-from PyQt4.QtGui import QTreeWidgetItem
-from PyQt4.QtCore import pyqtSignal
+# taken before the other imports so they count towards start up
+START_TIME = time.perf_counter()
 
-from excel import ExcelBook
-from doc_template import DocTemplate
-from doc_writer import write_doc
+import multiprocessing  # noqa: E402
+import os  # noqa: E402
+import sys  # noqa: E402
+
+from PyQt4 import QtGui, QtCore  # noqa: E402
+from PyQt4.QtGui import QTreeWidgetItem  # noqa: E402
+from PyQt4.QtCore import pyqtSignal  # noqa: E402
+
+from diagnostics_model import CellDiagnosticsModel  # noqa: E402
+from excel import ExcelBook  # noqa: E402
+from doc_template import DocTemplate  # noqa: E402
+from doc_writer import write_docs  # noqa: E402
+from job_scheduler import JobScheduler  # noqa: E402
+
+# seconds from start up to the window being drawn, checked with --startup-check
+STARTUP_BUDGET = 1.5
 
 
 def resource_path(relative_path):
@@ -22,6 +32,32 @@ def resource_path(relative_path):
     return os.path.join(base_path, relative_path)
 
 
+def load_ui():
+    """
+    Build the main window from the precompiled gui_ui module, parsing gui.ui at runtime only if it's missing
+    """
+    try:
+        from gui_ui import Ui_MainWindow
+    except ImportError:
+        from PyQt4 import uic
+        return uic.loadUi(resource_path("gui.ui"))
+
+    class CompiledUi(QtGui.QMainWindow, Ui_MainWindow):
+        def __init__(self):
+            QtGui.QMainWindow.__init__(self)
+            self.setupUi(self)
+
+    return CompiledUi()
+
+
+def warm_imports():
+    """
+    Import python-docx in the background so the first template load doesn't have to. openpyxl is left out, only the
+    excel sheet worker processes use it
+    """
+    import docx
+
+
 def build_tree_widget_item(parent, name, is_checkable=True):
     child = QTreeWidgetItem(parent)
     if is_checkable:
@@ -36,17 +72,19 @@ def build_tree_widget_item(parent, name, is_checkable=True):
 
 class MainWindow(QtGui.QWidget):
     update_progress_bar_signal = pyqtSignal('QString', int)
-    generate_doc_finished_signal = pyqtSignal()
 
     def __init__(self):
         QtGui.QWidget.__init__(self)
-        self.ui = uic.loadUi(resource_path("gui.ui"))
+        self.ui = load_ui()
 
         self.picker = self.ui.Picker
         self.excel_button = self.ui.ExcelButton
         self.word_button = self.ui.WordButton
         self.generate_button = self.ui.GenerateDocButton
         self.output = self.ui.Output
+        self.output_model = CellDiagnosticsModel(self.output)
+        self.excel_button.setIcon(QtGui.QIcon(resource_path("excel-icon.png")))
+        self.word_button.setIcon(QtGui.QIcon(resource_path("word-icon.png")))
         self.progress_bar = QtGui.QProgressBar()
         self.progress_bar.setMaximum(100)
         self.progress_bar.setMinimum(0)
@@ -54,15 +92,12 @@ class MainWindow(QtGui.QWidget):
         self.progress_label.setFixedWidth(120)
 
         self.book = ExcelBook()
-        self.doc = DocTemplate()
+        self.templates = []
 
         self.constituency_picker = None
-        self.dodgy_cell_picker = None
-        self.empty_cell_picker = None
-        self.missing_column_picker = None
 
-        self.loading_counter = 0
-        self.lock = threading.Lock()
+        self.scheduler = JobScheduler(parent=self)
+        self.scheduler.active_changed.connect(self.update_buttons)
 
         self.excel_loading_movie = QtGui.QMovie(resource_path("loading.gif"))
         self.word_loading_movie = QtGui.QMovie(resource_path("loading.gif"))
@@ -70,19 +105,10 @@ class MainWindow(QtGui.QWidget):
         self.excel_loading_movie.frameChanged.connect(self.set_excel_icon)
         self.word_loading_movie.frameChanged.connect(self.set_word_icon)
 
-        self.doc.started.connect(self.word_loading_movie.start)
-        self.doc.finished.connect(self.doc_loaded)
-
         self.update_progress_bar_signal.connect(self.update_progress_bar)
-        self.generate_doc_finished_signal.connect(self.doc_generated)
 
         self.init_ui()
 
-    def set_up_book(self):
-        self.book.started.connect(self.excel_loading_movie.start)
-        self.book.progress.connect(self.update_progress_bar)
-        self.book.finished.connect(self.book_loaded)
-
     def init_ui(self):
         self.init_pickers()
         self.init_output()
@@ -100,13 +126,7 @@ class MainWindow(QtGui.QWidget):
         self.ui.statusBar().addWidget(self.progress_bar, 1)
 
     def init_output(self):
-        self.dodgy_cell_picker = build_tree_widget_item(self.output, "Cells with possible errors", False)
-        self.dodgy_cell_picker.setDisabled(True)
-        self.dodgy_cell_picker.setToolTip(0, "Cells that couldn't be decoded but aren't empty. Most likely a space")
-        self.empty_cell_picker = build_tree_widget_item(self.output, "Empty cells", False)
-        self.empty_cell_picker.setDisabled(True)
-        self.missing_column_picker = build_tree_widget_item(self.output, "Table columns not in the Excel sheet", False)
-        self.missing_column_picker.setDisabled(True)
+        self.output.setModel(self.output_model)
 
     def init_button_connections(self):
         self.excel_button.clicked.connect(self.excel_button_clicked)
@@ -136,128 +156,135 @@ class MainWindow(QtGui.QWidget):
 
     def excel_button_clicked(self):
         filename = QtGui.QFileDialog.getOpenFileName(self, "Select Excel file", "", "Excel files (*.xlsx)")
-        t = threading.Thread(target=self.load_excel, args=(filename,))
-        t.start()
-
-    def load_excel(self, filename):
-        self.increment_counter(self.excel_button)
-        self.book = ExcelBook()
-        self.set_up_book()
-        self.book.load(filename)
-        if self.book.loaded:
-            self.load_picker_data()
-            self.excel_button.setText(self.book.name)
-        self.decrement_counter(self.excel_button)
-
-    def word_button_clicked(self):
-        filename = QtGui.QFileDialog.getOpenFileName(self, "Select Word template", "", "Word files (*.docx)")
-        t = threading.Thread(target=self.load_doc, args=(filename,))
-        t.start()
+        if filename:
+            self.excel_loading_movie.start()
+            self.scheduler.submit(self.load_excel, filename, priority=JobScheduler.INTERACTIVE,
+                                  key=("excel", filename), group="excel", pass_job=True,
+                                  on_finished=self.book_loaded, on_failed=self.book_load_failed)
 
-    def load_doc(self, filename):
-        self.increment_counter(self.word_button)
-        self.doc.load(filename)
-        if self.doc.loaded:
-            self.word_button.setText(self.doc.name)
-        self.decrement_counter(self.word_button)
+    def load_excel(self, job, filename):
+        """
+        Runs on a scheduler thread, widgets are only updated from book_loaded
 
-    def do_generate_doc_work(self):
-        constituencies_selected = self.get_selected_constituencies()
+        Picking another file cancels the job, the load then stops between sheets and its progress is no longer shown
+        """
+        def progress(message, value):
+            if not job.cancelled:
+                self.update_progress_bar_signal.emit(message, value)
 
-        if constituencies_selected:
-            self.update_progress_bar_signal.emit("Writing docs...", 0)
+        book = ExcelBook()
+        book.progress.connect(progress)
+        book.load(filename, cancelled=lambda: job.cancelled)
 
-            num_cs = len(constituencies_selected)
-            for idx, c in enumerate(constituencies_selected):
-                write_doc(c, self.book, self.doc)
-                self.update_progress_bar_signal.emit(c, int((100.0 * (idx + 1)) / num_cs))
+        return book
 
-            self.update_progress_bar_signal.emit("Done!", 100)
-
-        self.generate_doc_finished_signal.emit()
+    def word_button_clicked(self):
+        filenames = QtGui.QFileDialog.getOpenFileNames(self, "Select Word templates", "", "Word files (*.docx)")
+        if filenames:
+            self.word_loading_movie.start()
+            self.scheduler.submit(self.load_docs, list(filenames), priority=JobScheduler.INTERACTIVE,
+                                  key=("templates", tuple(filenames)), group="templates", pass_job=True,
+                                  on_finished=self.doc_loaded, on_failed=self.doc_load_failed)
+
+    def load_docs(self, job, filenames):
+        """ Runs on a scheduler thread, widgets are only updated from doc_loaded. Stops early once superseded """
+        templates = []
+        for filename in filenames:
+            if job.cancelled:
+                break
+
+            doc = DocTemplate()
+            doc.load(filename)
+            if doc.loaded:
+                templates.append(doc)
+
+        return templates
+
+    def do_generate_doc_work(self, constituencies_selected, book, templates):
+        """ Runs on a scheduler thread with the book and templates as they were when generate was clicked """
+        self.update_progress_bar_signal.emit("Writing docs...", 0)
+
+        num_cs = len(constituencies_selected)
+        for idx, c in enumerate(constituencies_selected):
+            write_docs(c, book, templates)
+            self.update_progress_bar_signal.emit(c, int((100.0 * (idx + 1)) / num_cs))
+
+        self.update_progress_bar_signal.emit("Done!", 100)
 
     def generate_doc(self):
-        if not self.doc.loaded and not self.book.loaded:
+        if not self.templates and not self.book.loaded:
             QtGui.QMessageBox.critical(self, "", "Choose an excel sheet and word template")
-        elif not self.doc.loaded:
+        elif not self.templates:
             QtGui.QMessageBox.critical(self, "", "Choose an excel sheet and word template")
         elif not self.book.loaded:
             QtGui.QMessageBox.critical(self, "", "Choose an excel sheet and word template")
         else:
-            self.generate_button.setEnabled(False)
-            self.excel_button.setEnabled(False)
-            self.word_button.setEnabled(False)
-
-            t = threading.Thread(target=self.do_generate_doc_work)
-            t.start()
-
-    def doc_generated(self):
-        self.generate_button.setEnabled(True)
-        self.excel_button.setEnabled(True)
-        self.word_button.setEnabled(True)
-
-    def increment_counter(self, src):
-        self.lock.acquire()
-        self.loading_counter += 1
-        src.setEnabled(False)
-        self.generate_button.setEnabled(False)
-        self.lock.release()
-
-    def decrement_counter(self, src):
-        self.lock.acquire()
-        self.loading_counter -= 1
-        src.setEnabled(True)
-        if self.loading_counter == 0:
-            self.generate_button.setEnabled(True)
-        self.lock.release()
-
-    def doc_loaded(self):
+            constituencies_selected = self.get_selected_constituencies()
+            if constituencies_selected:
+                self.scheduler.submit(self.do_generate_doc_work, constituencies_selected, self.book, self.templates,
+                                      priority=JobScheduler.BATCH, group="generate")
+
+    def update_buttons(self):
+        """
+        Loading a new file while documents are being written would swap the data out from under them, so the load
+        buttons are locked during generation, and generation waits for loads to finish
+        """
+        generating = self.scheduler.is_active("generate")
+        loading = self.scheduler.is_active("excel") or self.scheduler.is_active("templates")
+
+        self.excel_button.setEnabled(not generating)
+        self.word_button.setEnabled(not generating)
+        self.generate_button.setEnabled(not generating and not loading)
+
+    def doc_loaded(self, templates):
         self.word_loading_movie.stop()
         self.word_button.setIcon(QtGui.QIcon(resource_path("word-icon.png")))
+
+        if templates:
+            self.templates = templates
+            if len(templates) == 1:
+                self.word_button.setText(templates[0].name)
+            else:
+                self.word_button.setText("{} templates".format(len(templates)))
+
         self.update_excel_word_output()
 
-    def book_loaded(self):
+    def doc_load_failed(self, error):
+        self.word_loading_movie.stop()
+        self.word_button.setIcon(QtGui.QIcon(resource_path("word-icon.png")))
+        self.update_progress_bar("Template load failed!", 0)
+
+    def book_loaded(self, book):
+        self.book = book
         self.excel_loading_movie.stop()
         self.excel_button.setIcon(QtGui.QIcon(resource_path("excel-icon.png")))
         if self.book.loaded:
+            self.load_picker_data()
+            self.excel_button.setText(self.book.name)
             self.update_progress_bar("Excel loaded", 100)
         else:
             self.update_progress_bar("Excel load failed!", 0)
-        dodgy_cells = self.book.get_dodgy_cells()
-        empty_cells = self.book.get_empty_cells()
-
-        if dodgy_cells:
-            self.init_output_picker(self.dodgy_cell_picker, dodgy_cells)
-
-        if empty_cells:
-            self.init_output_picker(self.empty_cell_picker, empty_cells)
+        self.output_model.set_cell_diagnostics(self.book.get_dodgy_cells(), self.book.get_empty_cells())
 
         self.update_excel_word_output()
 
-    def init_output_picker(self, picker, data):
-        picker.setDisabled(False)
-        picker.takeChildren()
-        for year in data:
-            year_picker = build_tree_widget_item(picker, year, False)
-            constituents = data[year]
-            for constituent in constituents:
-                constituent_picker = build_tree_widget_item(year_picker, constituent, False)
-                columns = constituents[constituent]
-                for col in columns:
-                    build_tree_widget_item(constituent_picker, col.replace("\n", " "), False)
+    def book_load_failed(self, error):
+        self.excel_loading_movie.stop()
+        self.excel_button.setIcon(QtGui.QIcon(resource_path("excel-icon.png")))
+        self.update_progress_bar("Excel load failed!", 0)
 
     def update_excel_word_output(self):
         doc_columns_not_in_excel = []
 
-        if self.book.loaded and self.doc.loaded:
-            doc_headers = self.doc.all_headers
-            doc_columns_not_in_excel = [h for h in doc_headers if not self.book.column_exists(h)]
+        if self.book.loaded:
+            for doc in self.templates:
+                missing = [h for h in doc.all_headers if not self.book.column_exists(h)]
+                if len(self.templates) > 1:
+                    missing = ["{}: {}".format(doc.name, h) for h in missing]
 
-        if doc_columns_not_in_excel:
-            self.missing_column_picker.setDisabled(False)
-            self.missing_column_picker.takeChildren()
-            for h in doc_columns_not_in_excel:
-                build_tree_widget_item(self.missing_column_picker, h, False)
+                doc_columns_not_in_excel += missing
+
+        self.output_model.set_missing_columns(doc_columns_not_in_excel)
 
     def set_excel_icon(self, _):
         self.excel_button.setIcon(QtGui.QIcon(self.excel_loading_movie.currentPixmap()))
@@ -273,12 +300,28 @@ class MainWindow(QtGui.QWidget):
 
 
 def quitting():
-    pass
+    window.scheduler.shutdown()
+
+
+def check_startup(app):
+    startup_time = time.perf_counter() - START_TIME
+    print("Window shown after {:.2f}s, budget is {:.2f}s".format(startup_time, STARTUP_BUDGET))
+    app.exit(0 if startup_time <= STARTUP_BUDGET else 1)
 
 
 if __name__ == '__main__':
+    # the excel sheet workers are separate processes, which need this in a PyInstaller build
+    multiprocessing.freeze_support()
+
     app = QtGui.QApplication(sys.argv)
 
     window = MainWindow()
-    app.connect(app, Qt.SIGNAL("aboutToQuit()"), quitting)
+    app.aboutToQuit.connect(quitting)
+
+    if "--startup-check" in sys.argv:
+        # runs once the event loop has drawn the window
+        QtCore.QTimer.singleShot(0, lambda: check_startup(app))
+    else:
+        window.scheduler.submit(warm_imports, priority=JobScheduler.BACKGROUND)
+
     sys.exit(app.exec_())
@@ -0,0 +1,289 @@
+"""
+Local document generation service
+
+Keeps workbooks and templates loaded between requests so other tools can ask for a single constituency's report
+without going through the GUI. Speaks just enough HTTP/1.1 over TCP or a unix socket:
+
+    GET /render?book=<xlsx path>&template=<docx path>&constituency=<name>
+    GET /health
+
+The book and template can be left out of the query if defaults were given on the command line.
+"""
+import argparse
+import asyncio
+import collections
+import concurrent.futures
+import http
+import os
+import sys
+import urllib.parse
+
+from doc_template import DocTemplate
+from doc_writer import render_doc
+from excel import ExcelBook
+
+DOCX_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+CHUNK_SIZE = 64 * 1024
+MAX_HEADER_LINES = 100
+
+
+class ServiceError(Exception):
+    def __init__(self, status, message):
+        Exception.__init__(self, message)
+        self.status = status
+        self.message = message
+
+
+class LRUCache:
+    """
+    Least recently used cache of loaded books and templates, keyed by (kind, path, mtime) so edited files reload
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._items = collections.OrderedDict()
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def __len__(self):
+        return len(self._items)
+
+    def get(self, key):
+        if key not in self._items:
+            return None
+
+        self._items.move_to_end(key)
+        return self._items[key]
+
+    def put(self, key, value):
+        self._items[key] = value
+        self._items.move_to_end(key)
+        while len(self._items) > self.capacity:
+            self._items.popitem(last=False)
+
+
+def _load_book(path):
+    book = ExcelBook()
+    if not book.load(path):
+        raise ServiceError(http.HTTPStatus.UNPROCESSABLE_ENTITY, "No year sheets found in {}".format(path))
+
+    return book
+
+
+def _load_template(path):
+    template = DocTemplate()
+    template.load(path)
+
+    return template
+
+
+def _render(book, template, constituency):
+    if constituency not in book.get_constituencies()[book.years[0]]:
+        raise ServiceError(http.HTTPStatus.NOT_FOUND, "Unknown constituency {}".format(constituency))
+
+    try:
+        data = render_doc(constituency, book, template)
+    except KeyError:
+        raise ServiceError(http.HTTPStatus.NOT_FOUND, "{} is missing from some years".format(constituency))
+
+    if not data:
+        raise ServiceError(http.HTTPStatus.NOT_FOUND, "No data for {}".format(constituency))
+
+    return data
+
+
+class GenerationService:
+    """
+    Serves rendered documents, running loads and renders on a worker pool
+
+    Identical requests that arrive while one is already being worked on wait for the same result instead of being
+    done twice, and the same goes for loading a book or template
+    """
+
+    def __init__(self, default_book=None, default_template=None, cache_size=8, max_workers=None):
+        self.default_book = default_book
+        self.default_template = default_template
+
+        self._cache = LRUCache(cache_size)
+        self._in_flight = {}
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+        self._server = None
+
+    async def start(self, host="127.0.0.1", port=0, unix_path=None):
+        """
+        Start listening. Use port 0 to pick a free port, the bound address is in 'addresses'
+        """
+        if unix_path:
+            self._server = await asyncio.start_unix_server(self._handle, path=unix_path)
+        else:
+            self._server = await asyncio.start_server(self._handle, host=host, port=port)
+
+        return self._server
+
+    @property
+    def addresses(self):
+        return [s.getsockname() for s in self._server.sockets] if self._server else []
+
+    async def serve_forever(self):
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+
+        self._executor.shutdown(wait=False)
+
+    async def render(self, book_path, template_path, constituency):
+        """
+        Returns:
+            Bytes of the .docx for the constituency
+        """
+        book_key = _file_key("book", book_path)
+        template_key = _file_key("template", template_path)
+
+        return await self._coalesce(("render", book_key, template_key, constituency),
+                                    lambda: self._do_render(book_key, template_key, constituency))
+
+    async def _do_render(self, book_key, template_key, constituency):
+        book = await self._get(book_key, _load_book)
+        template = await self._get(template_key, _load_template)
+
+        return await self._run(_render, book, template, constituency)
+
+    async def _get(self, key, loader):
+        cached = self._cache.get(key)
+        if cached is not None:
+            return cached
+
+        return await self._coalesce(key, lambda: self._load(key, loader))
+
+    async def _load(self, key, loader):
+        value = await self._run(loader, key[1])
+        self._cache.put(key, value)
+
+        return value
+
+    async def _coalesce(self, key, make_coroutine):
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(make_coroutine())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+
+        # shielded so a client hanging up doesn't cancel the work for everyone else waiting on it
+        return await asyncio.shield(task)
+
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    async def _handle(self, reader, writer):
+        try:
+            try:
+                method, target = await _read_request(reader)
+                if method != "GET":
+                    raise ServiceError(http.HTTPStatus.METHOD_NOT_ALLOWED, "Only GET is supported")
+
+                url = urllib.parse.urlsplit(target)
+                query = dict(urllib.parse.parse_qsl(url.query))
+
+                if url.path == "/health":
+                    await _respond(writer, http.HTTPStatus.OK, b"ok\n")
+                elif url.path == "/render":
+                    book_path = query.get("book", self.default_book)
+                    template_path = query.get("template", self.default_template)
+                    constituency = query.get("constituency")
+                    if not (book_path and template_path and constituency):
+                        raise ServiceError(http.HTTPStatus.BAD_REQUEST, "book, template and constituency are needed")
+
+                    data = await self.render(book_path, template_path, constituency)
+                    filename = urllib.parse.quote(constituency + ".docx")
+                    await _respond(writer, http.HTTPStatus.OK, data, DOCX_CONTENT_TYPE,
+                                   {"Content-Disposition": "attachment; filename*=UTF-8''" + filename})
+                else:
+                    raise ServiceError(http.HTTPStatus.NOT_FOUND, "Unknown path {}".format(url.path))
+            except ServiceError as e:
+                await _respond(writer, e.status, (e.message + "\n").encode("utf-8"))
+            except Exception as e:
+                await _respond(writer, http.HTTPStatus.INTERNAL_SERVER_ERROR, (repr(e) + "\n").encode("utf-8"))
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+
+def _file_key(kind, path):
+    path = os.path.abspath(path)
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        raise ServiceError(http.HTTPStatus.NOT_FOUND, "File not found {}".format(path))
+
+    return kind, path, mtime
+
+
+async def _read_request(reader):
+    """
+    Returns:
+        Tuple of the method and the request target, headers are read and ignored
+    """
+    request_line = await reader.readline()
+    parts = request_line.decode("latin-1").split()
+    if len(parts) != 3:
+        raise ServiceError(http.HTTPStatus.BAD_REQUEST, "Bad request line")
+
+    for _ in range(MAX_HEADER_LINES):
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            return parts[0], parts[1]
+
+    raise ServiceError(http.HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, "Too many headers")
+
+
+async def _respond(writer, status, body, content_type="text/plain; charset=utf-8", headers=None):
+    head = ["HTTP/1.1 {} {}".format(status.value, status.phrase),
+            "Content-Type: " + content_type,
+            "Content-Length: {}".format(len(body)),
+            "Connection: close"]
+    head += ["{}: {}".format(k, v) for k, v in (headers or {}).items()]
+
+    writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1"))
+    for start in range(0, len(body), CHUNK_SIZE):
+        writer.write(body[start:start + CHUNK_SIZE])
+        await writer.drain()
+
+    await writer.drain()
+
+
+async def _serve(args):
+    service = GenerationService(args.book, args.template, args.cache_size, args.workers)
+    await service.start(args.host, args.port, args.unix)
+    print("Serving on {}".format(", ".join(str(a) for a in service.addresses)))
+
+    try:
+        await service.serve_forever()
+    finally:
+        await service.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve constituency documents over HTTP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", help="listen on a unix socket at this path instead of TCP")
+    parser.add_argument("--book", help="default excel workbook")
+    parser.add_argument("--template", help="default word template")
+    parser.add_argument("--cache-size", type=int, default=8, help="number of books and templates to keep loaded")
+    parser.add_argument("--workers", type=int, default=None, help="size of the load/render worker pool")
+    args = parser.parse_args(argv)
+
+    try:
+        asyncio.run(_serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,139 @@
+import column_name_formatter as cf
+
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_TBL = _W + "tbl"
+_TR = _W + "tr"
+_TC = _W + "tc"
+_TC_PR = _W + "tcPr"
+_GRID_SPAN = _W + "gridSpan"
+_V_MERGE = _W + "vMerge"
+_VAL = _W + "val"
+_P = _W + "p"
+_R = _W + "r"
+_HYPERLINK = _W + "hyperlink"
+_T = _W + "t"
+_BR = _W + "br"
+_BR_TYPE = _W + "type"
+
+# run content with fixed text, w:t and w:br are handled separately
+_RUN_CHARACTERS = {_W + "tab": "\t", _W + "ptab": "\t", _W + "cr": "\n", _W + "noBreakHyphen": "-"}
+
+
+class TableIndex:
+    """
+    The layout of one w:tbl, read straight from the xml in a single pass
+
+    Each row is a list of w:tc elements by grid column, the same cells python-docx gives for row.cells: a cell spanning
+    several columns (gridSpan) is repeated, and a vertically merged cell (vMerge continue) is the cell it continues
+    """
+
+    def __init__(self, tbl):
+        self.element = tbl
+        self.rows = []
+
+        previous = []
+        for tr in tbl.iterchildren(_TR):
+            row = []
+            for tc in tr.iterchildren(_TC):
+                span, continues = _cell_properties(tc)
+                if continues and len(row) < len(previous):
+                    tc = previous[len(row)]
+
+                row.extend([tc] * span)
+
+            self.rows.append(row)
+            previous = row
+
+        header_cells = self.rows[0][1:] if self.rows else []
+        self.headers = [cell_text(tc) for tc in header_cells]
+        self.column_map = {cf.fmt(h): idx + 1 for idx, h in enumerate(self.headers)}
+
+        self.years = []
+        self.year_rows = {}
+        for row in self.rows[1:]:
+            year = cell_text(row[0]) if row else ""
+            self.years.append(year)
+            self.year_rows[year] = row
+
+
+class TemplateIndex:
+    """
+    Every table of a document body, plus a flat index of the cells that can be filled
+
+    Like DocTemplate, a header found in several tables belongs to the last of them, and a year found in several rows
+    of a table belongs to the last row
+    """
+
+    def __init__(self, body):
+        """
+        Args:
+            body: w:body element of the document
+        """
+        self.tables = [TableIndex(tbl) for tbl in body.iterchildren(_TBL)]
+
+        self.header_tables = {}  # standard header to the TableIndex it's written to
+        for table in self.tables:
+            for standard_name in table.column_map:
+                self.header_tables[standard_name] = table
+
+        self.standard_headers = set(self.header_tables)
+
+        self.slots = {}  # (year, standard header) to w:tc
+        for standard_name, table in self.header_tables.items():
+            column = table.column_map[standard_name]
+            for year, row in table.year_rows.items():
+                if column < len(row):
+                    self.slots[(year, standard_name)] = row[column]
+
+
+def cell_text(tc):
+    """
+    Text of a w:tc the way python-docx 1.2 reads it: paragraphs joined with newlines, runs inside hyperlinks included,
+    line breaks as newlines and page or column breaks left out
+    """
+    paragraphs = []
+    for p in tc.iterchildren(_P):
+        text = []
+        for child in p.iterchildren(_R, _HYPERLINK):
+            runs = child.iterchildren(_R) if child.tag == _HYPERLINK else [child]
+            for r in runs:
+                _run_text(r, text)
+
+        paragraphs.append("".join(text))
+
+    return "\n".join(paragraphs)
+
+
+def _run_text(r, text):
+    """
+    Append the text of a w:r to the list
+    """
+    for child in r:
+        if child.tag == _T:
+            text.append(child.text or "")
+        elif child.tag == _BR:
+            if child.get(_BR_TYPE, "textWrapping") == "textWrapping":
+                text.append("\n")
+        elif child.tag in _RUN_CHARACTERS:
+            text.append(_RUN_CHARACTERS[child.tag])
+
+
+def _cell_properties(tc):
+    """
+    Returns:
+        Tuple of the number of grid columns the cell spans and whether it continues a vertical merge
+    """
+    span = 1
+    continues = False
+
+    tc_pr = tc.find(_TC_PR)
+    if tc_pr is not None:
+        grid_span = tc_pr.find(_GRID_SPAN)
+        if grid_span is not None:
+            span = int(grid_span.get(_VAL, "1"))
+
+        v_merge = tc_pr.find(_V_MERGE)
+        if v_merge is not None:
+            continues = v_merge.get(_VAL, "continue") == "continue"
+
+    return span, continues
@@ -0,0 +1,56 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+YEARS = ["2012", "2013", "2014"]
+HEADERS = ["Total Clients", "Spend", "No. of visits"]
+CONSTITUENCIES = ["Angus", "Banff", "Carrick", "Dundee", "All Constituents"]
+
+
+@pytest.fixture
+def template_path(tmp_path):
+    """
+    A template with a table of every year and header, where the Spend cells of 2012 and 2013 are vertically merged
+    """
+    docx = pytest.importorskip("docx")
+
+    doc = docx.Document()
+    doc.add_paragraph("Summary")
+    table = doc.add_table(rows=len(YEARS) + 1, cols=len(HEADERS) + 1)
+    for idx, header in enumerate(HEADERS, 1):
+        table.cell(0, idx).text = header
+    for idx, year in enumerate(YEARS, 1):
+        table.cell(idx, 0).text = year
+    table.cell(1, 2).merge(table.cell(2, 2))
+    doc.add_paragraph("Notes & <details>")
+
+    path = tmp_path / "summary.docx"
+    doc.save(str(path))
+    return str(path)
+
+
+@pytest.fixture
+def book_path(tmp_path):
+    """
+    A workbook with a sheet per year laid out like the real data
+    """
+    openpyxl = pytest.importorskip("openpyxl")
+
+    book = openpyxl.Workbook()
+    book.remove(book.active)
+    for year_idx, year in enumerate(YEARS):
+        sheet = book.create_sheet(year)
+        sheet.cell(3, 2, "Constituency")
+        for col, header in enumerate(HEADERS, 3):
+            sheet.cell(3, col, header)
+        for row, constituency in enumerate(CONSTITUENCIES, 4):
+            sheet.cell(row, 2, constituency)
+            for col in range(3, 3 + len(HEADERS)):
+                sheet.cell(row, col, 100 * year_idx + 10 * row + col)
+
+    path = tmp_path / "data.xlsx"
+    book.save(str(path))
+    return str(path)
@@ -0,0 +1,119 @@
+import io
+import os
+import shutil
+import time
+import zipfile
+
+import pytest
+
+pytest.importorskip("PyQt4")
+pytest.importorskip("docx")
+pytest.importorskip("openpyxl")
+
+import batch  # noqa: E402
+from conftest import CONSTITUENCIES  # noqa: E402
+
+
+def _lock(manifest, unit):
+    return os.path.join(manifest.directory, "claims", unit["id"] + ".lock")
+
+
+@pytest.fixture
+def manifest(tmp_path):
+    return batch.WorkManifest.create(str(tmp_path / "work"), "data.xlsx", ["summary.docx"], ["Angus", "Banff"])
+
+
+def test_every_unit_is_claimed_once(manifest):
+    claimed = []
+    for worker_id in ["w1", "w2"]:
+        unit = manifest.claim(worker_id)
+        claimed.append(unit["id"])
+        manifest.complete(unit, worker_id)
+
+    assert manifest.claim("w1") is None
+    assert manifest.unfinished() == 0
+    assert sorted(claimed) == sorted(u["id"] for u in manifest.units)
+    assert manifest.status() == {"done": 2, "failed": 0, "claimed": 0, "waiting": 0}
+
+
+def test_fresh_claim_is_not_taken_over(manifest):
+    first = manifest.claim("w1")
+    second = manifest.claim("w2")
+
+    assert second["id"] != first["id"]
+    assert manifest.claim("w3") is None
+    assert manifest.unfinished() == 2
+
+
+def test_release_leaves_a_claim_taken_over(manifest):
+    slow = batch.WorkManifest(manifest.directory)
+    fast = batch.WorkManifest(manifest.directory)
+
+    unit = slow.claim("slow", claim_timeout=600)
+    for other in manifest.units:
+        if other["id"] != unit["id"]:
+            fast.complete(other, "fast")
+    os.utime(_lock(manifest, unit), (0, 0))
+
+    assert fast.claim("fast", claim_timeout=600)["id"] == unit["id"]
+
+    slow.release(unit, "slow")
+    assert os.path.exists(_lock(manifest, unit))
+
+    fast.release(unit, "fast")
+    assert not os.path.exists(_lock(manifest, unit))
+
+
+def _work_dir(tmp_path, book_path, template_paths):
+    return batch.WorkManifest.create(str(tmp_path / "work"), book_path, template_paths, CONSTITUENCIES)
+
+
+def _assert_documents(directory, count):
+    names = [n for n in os.listdir(directory) if n.endswith(".docx")]
+    assert len(names) == count
+    for name in names:
+        with zipfile.ZipFile(os.path.join(directory, name)) as z:
+            assert z.testzip() is None
+
+
+def test_several_processes_share_the_work(tmp_path, book_path, template_path):
+    second_template = str(tmp_path / "detailed.docx")
+    shutil.copy(template_path, second_template)
+    manifest = _work_dir(tmp_path, book_path, [template_path, second_template])
+
+    assert batch.main(["work", manifest.directory, "--processes", "3"]) == 0
+
+    assert manifest.status() == {"done": 2 * len(CONSTITUENCIES), "failed": 0, "claimed": 0, "waiting": 0}
+    assert os.listdir(os.path.join(manifest.directory, "claims")) == []
+    _assert_documents(os.path.join(manifest.output_dir, "summary"), len(CONSTITUENCIES))
+    _assert_documents(os.path.join(manifest.output_dir, "detailed"), len(CONSTITUENCIES))
+
+
+def test_claim_of_a_dead_worker_is_taken_over(tmp_path, book_path, template_path):
+    manifest = _work_dir(tmp_path, book_path, [template_path])
+    dead = batch.WorkManifest(manifest.directory).claim("dead")
+
+    start = time.monotonic()
+    done = batch.run_worker(manifest.directory, claim_timeout=1)
+
+    assert done == len(CONSTITUENCIES)
+    assert time.monotonic() - start >= 1
+    assert manifest.status()["done"] == len(CONSTITUENCIES)
+    assert not os.path.exists(_lock(manifest, dead))
+
+
+def test_missing_template_only_fails_its_own_units(tmp_path, book_path, template_path):
+    manifest = _work_dir(tmp_path, book_path, [template_path, str(tmp_path / "missing.docx")])
+
+    assert batch.run_worker(manifest.directory) == len(CONSTITUENCIES)
+    assert manifest.status() == {"done": len(CONSTITUENCIES), "failed": len(CONSTITUENCIES), "claimed": 0,
+                                 "waiting": 0}
+
+
+def test_missing_book_leaves_units_waiting(tmp_path, template_path):
+    manifest = _work_dir(tmp_path, str(tmp_path / "missing.xlsx"), [template_path])
+
+    with pytest.raises(ValueError):
+        batch.run_worker(manifest.directory)
+
+    assert manifest.status()["waiting"] == len(CONSTITUENCIES)
@@ -0,0 +1,78 @@
+import io
+import threading
+import zipfile
+
+import pytest
+
+pytest.importorskip("PyQt4")
+pytest.importorskip("docx")
+
+from doc_template import DocTemplate  # noqa: E402
+from doc_writer import render_values  # noqa: E402
+
+
+def _load(path, compile_template=True):
+    template = DocTemplate()
+    template.load(path, compile_template)
+    return template
+
+
+def _values(constituency):
+    return {
+        ("2012", "totalclients"): constituency + " 2012",
+        ("2013", "totalclients"): constituency + " 2013",
+        ("2012", "spend"): "S2012",
+        ("2013", "spend"): "S2013",
+        ("2014", "numberofvisits"): " 7 & <8> ",
+    }
+
+
+def _table_text(docx_bytes):
+    import docx
+
+    table = docx.Document(io.BytesIO(docx_bytes)).tables[0]
+    return [[cell.text for cell in row.cells] for row in table.rows]
+
+
+def test_matches_python_docx(template_path):
+    compiled = _load(template_path)
+    assert compiled.compiled is not None
+
+    values = _values("Angus")
+    expected = render_values("Angus", values, _load(template_path, compile_template=False))
+    actual = render_values("Angus", values, compiled)
+
+    assert _table_text(actual) == _table_text(expected)
+
+
+def test_merged_cell_takes_last_year(template_path):
+    out = render_values("Angus", _values("Angus"), _load(template_path))
+
+    rows = _table_text(out)
+    assert rows[1][2] == "S2013"
+    assert rows[2][2] == "S2013"
+
+
+def test_concurrent_renders_are_valid_archives(template_path):
+    template = _load(template_path)
+    outputs = []
+    lock = threading.Lock()
+
+    def render(worker):
+        for idx in range(50):
+            constituency = "C{}-{}".format(worker, idx)
+            data = template.compiled.render(constituency, _values(constituency))
+            with lock:
+                outputs.append((constituency, data))
+
+    threads = [threading.Thread(target=render, args=(worker,)) for worker in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(outputs) == 400
+    for constituency, data in outputs:
+        with zipfile.ZipFile(io.BytesIO(data)) as z:
+            assert z.testzip() is None
+            assert (constituency + " 2012").encode("utf-8") in z.read("word/document.xml")
@@ -0,0 +1,93 @@
+import pytest
+
+pytest.importorskip("PyQt4")
+pytest.importorskip("numpy")
+openpyxl = pytest.importorskip("openpyxl")
+
+from derived_columns import Column, DerivedColumn, mean, share, yoy  # noqa: E402
+from excel import ExcelBook  # noqa: E402
+
+# constituencies are reordered between years, Banff is missing from 2013 on and Dundee only starts in 2013
+CLIENTS = {
+    "2012": [("Angus", 10), ("Banff", 20), ("Carrick", 30), ("All Constituents", 60)],
+    "2013": [("Carrick", 33), ("Angus", 12), ("Dundee", 5), ("All Constituents", 50)],
+    "2014": [("Angus", 16), ("Dundee", 7), ("Carrick", None), ("All Constituents", 23)],
+}
+
+
+def _load(tmp_path, derived, extra_2014=None):
+    book = openpyxl.Workbook()
+    book.remove(book.active)
+    for year, rows in CLIENTS.items():
+        sheet = book.create_sheet(year)
+        sheet.cell(1, 1, "Constituency")
+        sheet.cell(1, 2, "Number of Clients")
+        if year == "2014" and extra_2014:
+            sheet.cell(1, 3, extra_2014)
+        for row, (constituency, clients) in enumerate(rows, 2):
+            sheet.cell(row, 1, constituency)
+            sheet.cell(row, 2, clients)
+            if year == "2014" and extra_2014:
+                sheet.cell(row, 3, 111)
+
+    path = tmp_path / "clients.xlsx"
+    book.save(str(path))
+
+    excel_book = ExcelBook(max_workers=1, derived_columns=derived)
+    assert excel_book.load(str(path))
+    return excel_book
+
+
+def _raw(book, year, constituency, header):
+    value = book.get_data(year, constituency, header)
+    return value.raw if value else None
+
+
+def test_yoy_lines_up_constituencies_across_years(tmp_path):
+    book = _load(tmp_path, [DerivedColumn("Change in Clients", yoy("Number of Clients"), "0")])
+
+    assert [_raw(book, "2012", c, "Change in Clients") for c, _ in CLIENTS["2012"]] == [None] * 4
+    assert _raw(book, "2013", "Carrick", "Change in Clients") == 3
+    assert _raw(book, "2013", "Angus", "Change in Clients") == 2
+    assert _raw(book, "2013", "Dundee", "Change in Clients") is None
+    assert _raw(book, "2014", "Dundee", "Change in Clients") == 2
+    assert _raw(book, "2014", "Carrick", "Change in Clients") is None
+    assert book.get_data("2014", "Carrick", "Change in Clients") == ""
+
+
+def test_share_of_the_total_row(tmp_path):
+    book = _load(tmp_path, [DerivedColumn("Share of Clients", share("Number of Clients"), "0.0%")])
+
+    assert _raw(book, "2013", "Angus", "Share of Clients") == pytest.approx(12 / 50)
+    assert book.get_data("2013", "Angus", "Share of Clients").formatted == "24.0%"
+    assert _raw(book, "2013", "All Constituents", "Share of Clients") == 1
+
+
+def test_mean_needs_every_year(tmp_path):
+    book = _load(tmp_path, [DerivedColumn("2 Year Average", mean("Number of Clients", 2), "0.0")])
+
+    assert _raw(book, "2014", "Angus", "2 Year Average") == 14
+    assert _raw(book, "2014", "Dundee", "2 Year Average") == 6
+    assert _raw(book, "2013", "Dundee", "2 Year Average") is None
+    assert _raw(book, "2012", "Angus", "2 Year Average") is None
+
+
+def test_expressions_combine(tmp_path):
+    ratio = Column("Number of Clients") / Column("Number of Clients", years_back=1) * 100
+    book = _load(tmp_path, [DerivedColumn("Growth", ratio, "0")])
+
+    assert _raw(book, "2013", "Angus", "Growth") == 120
+
+
+def test_existing_column_in_any_year_is_kept(tmp_path):
+    book = _load(tmp_path, [DerivedColumn("Ratio", Column("Number of Clients") / 2, "0")], extra_2014="Ratio")
+
+    assert book.sheets["2014"].column_headers.count("Ratio") == 1
+    assert _raw(book, "2014", "Angus", "Ratio") == 111
+    assert not book.sheets["2013"].column_exists("Ratio")
+
+
+def test_missing_source_column_skips(tmp_path):
+    book = _load(tmp_path, [DerivedColumn("Visits Change", yoy("Number of Visits"), "0")])
+
+    assert not any(sheet.column_exists("Visits Change") for sheet in book.sheets.values())
@@ -0,0 +1,52 @@
+import os
+import shutil
+import zipfile
+
+import pytest
+
+pytest.importorskip("PyQt4")
+pytest.importorskip("docx")
+pytest.importorskip("openpyxl")
+
+from doc_template import DocTemplate  # noqa: E402
+from doc_writer import output_dirs, template_dirs, write_docs  # noqa: E402
+from excel import ExcelBook  # noqa: E402
+
+
+def test_single_template_writes_into_output_dir():
+    assert template_dirs(["summary.docx"], "out") == ["out"]
+
+
+def test_template_dirs_are_unique():
+    names = ["summary.docx", "Summary.docx", "summary (2).docx", "detailed.docx"]
+
+    assert template_dirs(names, "out") == [os.path.join("out", name) for name in
+                                           ["summary", "Summary (2)", "summary (2) (2)", "detailed"]]
+
+
+def test_data_is_read_once_for_every_template(tmp_path, book_path, template_path):
+    other_folder = tmp_path / "other"
+    other_folder.mkdir()
+    same_name = str(other_folder / os.path.basename(template_path))
+    shutil.copy(template_path, same_name)
+
+    templates = []
+    for path in [template_path, same_name]:
+        template = DocTemplate()
+        template.load(path)
+        templates.append(template)
+
+    book = ExcelBook(max_workers=1, derived_columns=[])
+    assert book.load(book_path)
+
+    calls = []
+    get_constituency_data = book.get_constituency_data
+    book.get_constituency_data = lambda c: calls.append(c) or get_constituency_data(c)
+
+    write_docs("Angus", book, templates, str(tmp_path / "out"))
+
+    assert calls == ["Angus"]
+    for directory in output_dirs(templates, str(tmp_path / "out")):
+        with zipfile.ZipFile(os.path.join(directory, "Angus.docx")) as z:
+            assert b"Angus" in z.read("word/document.xml")
+    assert sorted(os.listdir(str(tmp_path / "out"))) == ["summary", "summary (2)"]
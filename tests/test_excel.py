@@ -0,0 +1,93 @@
+import pytest
+
+pytest.importorskip("PyQt4")
+openpyxl = pytest.importorskip("openpyxl")
+
+from excel import (CELL_BLANK, CELL_NUMERIC, CELL_TEXT, CELL_WHITESPACE, CELL_ZERO,  # noqa: E402
+                   ExcelBook, classify_column)
+
+
+@pytest.fixture
+def sparse_book_path(tmp_path):
+    """
+    Two year sheets where the first constituency has no Spend cell at all, not even an empty one
+    """
+    book = openpyxl.Workbook()
+    book.remove(book.active)
+    for year in ["2013", "2014"]:
+        sheet = book.create_sheet(year)
+        sheet.cell(1, 1, "Constituency")
+        sheet.cell(1, 2, "Spend")
+        sheet.cell(1, 3, "Total Clients")
+        for row, constituency in enumerate(["Angus", "Banff", "All Constituents"], 2):
+            sheet.cell(row, 1, constituency)
+            if row > 2:
+                sheet.cell(row, 2, row * 1.5).number_format = "0.00"
+            sheet.cell(row, 3, row * 10)
+
+    path = tmp_path / "sparse.xlsx"
+    book.save(str(path))
+    return str(path)
+
+
+@pytest.mark.parametrize("max_workers", [1, 2])
+def test_sparse_sheet_loads(sparse_book_path, max_workers):
+    book = ExcelBook(max_workers=max_workers, derived_columns=[])
+
+    assert book.load(sparse_book_path)
+    assert book.years == ["2013", "2014"]
+    assert book.get_data("2014", "Banff", "Total Clients").formatted == "30"
+    assert book.get_data("2014", "Banff", "Spend").formatted == "4"  # the format is read from the first row
+    assert book.get_data("2014", "Angus", "Spend") == ""
+    assert book.get_empty_cells()["2014"].to_dict() == {"Angus": ["Spend"]}
+
+
+def test_parallel_load_matches_serial(book_path):
+    serial = ExcelBook(max_workers=1, derived_columns=[])
+    parallel = ExcelBook(max_workers=3, derived_columns=[])
+
+    assert serial.load(book_path)
+    assert parallel.load(book_path)
+    assert parallel.years == serial.years
+    for year in serial.years:
+        for constituency in serial.sheets[year].constituencies:
+            assert (parallel.get_constituency_data(constituency)[year].keys() ==
+                    serial.get_constituency_data(constituency)[year].keys())
+            for header, value in serial.get_constituency_data(constituency)[year].items():
+                assert parallel.get_data(year, constituency, header).formatted == value.formatted
+
+
+def test_classify_column():
+    column = [3, 2.5, 0, 0.0, None, "", " ", "\n", "x", True, False, float("nan"), float("inf"), object()]
+
+    assert classify_column(column) == [
+        CELL_NUMERIC, CELL_NUMERIC, CELL_ZERO, CELL_ZERO, CELL_BLANK, CELL_BLANK, CELL_WHITESPACE, CELL_WHITESPACE,
+        CELL_TEXT, CELL_NUMERIC, CELL_ZERO, CELL_TEXT, CELL_TEXT, CELL_TEXT]
+
+
+def test_cell_kinds_are_written(tmp_path):
+    book = openpyxl.Workbook()
+    sheet = book.active
+    sheet.title = "2014"
+    sheet.cell(1, 1, "Constituency")
+    sheet.cell(1, 2, "Spend")
+    cells = [("Zero", 0), ("Blank", None), ("Space", " "), ("Text", "n/a"), ("Yes", True), ("No", False),
+             ("Number", 12.5), ("All Constituents", 100)]
+    for row, (constituency, value) in enumerate(cells, 2):
+        sheet.cell(row, 1, constituency)
+        sheet.cell(row, 2, value).number_format = "£0.00"
+
+    path = tmp_path / "kinds.xlsx"
+    book.save(str(path))
+
+    book = ExcelBook(max_workers=1, derived_columns=[])
+    assert book.load(str(path))
+
+    formatted = {c: book.get_data("2014", c, "Spend") for c, _ in cells}
+    assert formatted["Zero"].formatted == "£0.00"
+    assert formatted["Yes"].formatted == "£1.00"
+    assert formatted["No"].formatted == "£0.00"
+    assert formatted["Number"].formatted == "£12.50"
+    assert formatted["Blank"] == formatted["Space"] == formatted["Text"] == ""
+    assert book.get_empty_cells()["2014"].to_dict() == {"Blank": ["Spend"]}
+    assert book.get_dodgy_cells()["2014"].to_dict() == {"Space": ["Spend"], "Text": ["Spend"]}
@@ -0,0 +1,128 @@
+import threading
+import time
+
+import pytest
+
+QtCore = pytest.importorskip("PyQt4.QtCore")
+
+from job_scheduler import JobScheduler  # noqa: E402
+
+
+@pytest.fixture
+def app():
+    return QtCore.QCoreApplication.instance() or QtCore.QCoreApplication([])
+
+
+@pytest.fixture
+def scheduler(app):
+    scheduler = JobScheduler(max_workers=1)
+    yield scheduler
+    scheduler.shutdown()
+
+
+def _wait_until(app, condition, timeout=5):
+    """ Run the event loop, which delivers the queued results, until condition is true """
+    end = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < end, "timed out"
+        app.processEvents()
+        time.sleep(0.01)
+
+
+def _blocker(scheduler, **kwargs):
+    """
+    Submit a job that holds the only worker until the returned event is set
+    """
+    started = threading.Event()
+    release = threading.Event()
+
+    def block():
+        started.set()
+        release.wait(5)
+        return "blocker"
+
+    job = scheduler.submit(block, **kwargs)
+    assert started.wait(5)
+
+    return job, release
+
+
+def test_lowest_priority_value_runs_first(app, scheduler):
+    order = []
+    _, release = _blocker(scheduler)
+
+    for name, priority in [("background", JobScheduler.BACKGROUND), ("batch", JobScheduler.BATCH),
+                           ("interactive", JobScheduler.INTERACTIVE)]:
+        scheduler.submit(order.append, name, priority=priority)
+
+    release.set()
+    _wait_until(app, lambda: not scheduler.is_active())
+
+    assert order == ["interactive", "batch", "background"]
+
+
+def test_same_key_is_only_run_once(app, scheduler):
+    calls = []
+    results = []
+    _, release = _blocker(scheduler)
+
+    first = scheduler.submit(calls.append, "load", key=("excel", "a.xlsx"), on_finished=results.append)
+    second = scheduler.submit(calls.append, "load", key=("excel", "a.xlsx"), on_finished=results.append)
+
+    assert second is first
+
+    release.set()
+    _wait_until(app, lambda: not scheduler.is_active())
+
+    assert calls == ["load"]
+    assert results == [None]
+
+
+def test_group_supersedes_running_and_queued_jobs(app, scheduler):
+    finished = []
+    calls = []
+    running, release = _blocker(scheduler, group="excel", on_finished=finished.append)
+    queued = scheduler.submit(calls.append, "queued", group="excel", on_finished=finished.append)
+    latest = scheduler.submit(lambda: "latest", group="excel", on_finished=finished.append)
+
+    assert running.cancelled and queued.cancelled and not latest.cancelled
+    assert scheduler.is_active("excel")
+
+    release.set()
+    _wait_until(app, lambda: not scheduler.is_active())
+
+    # the running job's result is dropped and the queued one never runs
+    assert finished == ["latest"]
+    assert calls == []
+
+
+def test_cancelled_job_can_stop_early(app, scheduler):
+    steps = []
+    returned = []
+    finished = []
+
+    def load(job):
+        for step in range(500):
+            if job.cancelled:
+                returned.append("stopped")
+                return
+            steps.append(step)
+            time.sleep(0.01)
+        returned.append("loaded")
+
+    scheduler.submit(load, group="excel", pass_job=True, on_finished=finished.append)
+    _wait_until(app, lambda: len(steps) > 2)
+    scheduler.cancel_group("excel")
+    _wait_until(app, lambda: returned and not scheduler.is_active())
+    app.processEvents()
+
+    assert returned == ["stopped"]
+    assert finished == []
+
+
+def test_failures_go_to_on_failed(app, scheduler):
+    errors = []
+    scheduler.submit(int, "x", on_failed=errors.append)
+    _wait_until(app, lambda: errors)
+
+    assert isinstance(errors[0], ValueError)
@@ -0,0 +1,67 @@
+import asyncio
+import io
+import urllib.parse
+import zipfile
+
+import pytest
+
+pytest.importorskip("PyQt4")
+pytest.importorskip("docx")
+pytest.importorskip("openpyxl")
+
+from conftest import CONSTITUENCIES  # noqa: E402
+from service import GenerationService  # noqa: E402
+
+
+async def _get(port, target):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write("GET {} HTTP/1.1\r\nHost: localhost\r\n\r\n".format(target).encode("latin-1"))
+    await writer.drain()
+
+    response = await reader.read()
+    writer.close()
+
+    head, _, body = response.partition(b"\r\n\r\n")
+    return int(head.split()[1]), body
+
+
+def test_concurrent_renders_are_valid_documents(book_path, template_path):
+    async def run():
+        service = GenerationService(book_path, template_path, max_workers=8)
+        await service.start("127.0.0.1", 0)
+        port = service.addresses[0][1]
+
+        try:
+            targets = ["/render?constituency=" + urllib.parse.quote(CONSTITUENCIES[idx % len(CONSTITUENCIES)])
+                       for idx in range(40)]
+            return await asyncio.gather(*[_get(port, target) for target in targets])
+        finally:
+            await service.close()
+
+    responses = asyncio.run(run())
+
+    assert len(responses) == 40
+    for status, body in responses:
+        assert status == 200
+        with zipfile.ZipFile(io.BytesIO(body)) as z:
+            assert z.testzip() is None
+            assert b"Total Clients" in z.read("word/document.xml")
+
+
+def test_unknown_paths_and_files(template_path):
+    async def run():
+        service = GenerationService(template_path + ".missing", template_path)
+        await service.start("127.0.0.1", 0)
+        port = service.addresses[0][1]
+
+        try:
+            return (await _get(port, "/health"), await _get(port, "/nowhere"),
+                    await _get(port, "/render?constituency=Angus"))
+        finally:
+            await service.close()
+
+    health, unknown, missing = asyncio.run(run())
+
+    assert health == (200, b"ok\n")
+    assert unknown[0] == 404
+    assert missing[0] == 404
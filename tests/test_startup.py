@@ -0,0 +1,28 @@
+"""
+PyQt4 needs an X display on Linux, run headless with: xvfb-run python -m pytest tests/test_startup.py
+"""
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+pytest.importorskip("PyQt4")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.mark.skipif(sys.platform.startswith("linux") and not os.environ.get("DISPLAY"),
+                    reason="PyQt4 needs an X display, run under xvfb-run")
+def test_window_shown_within_budget():
+    from main import STARTUP_BUDGET
+
+    # --startup-check only times from the top of main.py, the wall time here also counts starting the interpreter
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "main.py", "--startup-check"], cwd=ROOT,
+                            stdout=subprocess.PIPE, stderr=subprocess.STDOUT, universal_newlines=True, timeout=60)
+    elapsed = time.perf_counter() - start
+
+    assert result.returncode == 0, result.stdout
+    assert elapsed <= STARTUP_BUDGET, "Window shown and closed after {:.2f}s".format(elapsed)
@@ -0,0 +1,50 @@
+import pytest
+
+docx = pytest.importorskip("docx")
+
+from docx.oxml import parse_xml  # noqa: E402
+
+from template_index import TemplateIndex, cell_text  # noqa: E402
+
+W = 'xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"'
+
+
+def _cell_with(*paragraphs):
+    table = docx.Document().add_table(rows=1, cols=1)
+    cell = table.cell(0, 0)
+    for p in cell._tc.findall(parse_xml("<w:p {}/>".format(W)).tag):
+        cell._tc.remove(p)
+    for p in paragraphs:
+        cell._tc.append(parse_xml("<w:p {}>{}</w:p>".format(W, p)))
+
+    return cell
+
+
+@pytest.mark.parametrize("paragraphs", [
+    ['<w:hyperlink><w:r><w:t>Total</w:t></w:r><w:r><w:t> Clients</w:t></w:r></w:hyperlink>'],
+    ['<w:r><w:t>Total</w:t><w:br/><w:t>Clients</w:t></w:r>'],
+    ['<w:r><w:t>Total</w:t><w:br w:type="page"/><w:br w:type="column"/><w:t>Clients</w:t></w:r>'],
+    ['<w:r><w:t>A</w:t><w:tab/><w:noBreakHyphen/><w:cr/></w:r>', '<w:r><w:t>B</w:t></w:r>'],
+])
+def test_cell_text_matches_python_docx(paragraphs):
+    cell = _cell_with(*paragraphs)
+
+    assert cell_text(cell._tc) == cell.text
+
+
+def test_index_matches_merged_cells():
+    doc = docx.Document()
+    table = doc.add_table(rows=4, cols=4)
+    for idx, header in enumerate(["Total Clients", "Spend", "No. of visits"], 1):
+        table.cell(0, idx).text = header
+    for idx, year in enumerate(["2012", "2013", "2014"], 1):
+        table.cell(idx, 0).text = year
+    table.cell(1, 2).merge(table.cell(2, 2))
+    table.cell(3, 1).merge(table.cell(3, 2))
+
+    index = TemplateIndex(doc.element.body).tables[0]
+
+    assert index.headers == [c.text for c in table.rows[0].cells[1:]]
+    assert index.years == ["2012", "2013", "2014"]
+    for row, indexed in zip(table.rows, index.rows):
+        assert indexed == [c._tc for c in row.cells]